@@ -0,0 +1,129 @@
+import argparse
+import random
+import time
+
+import pandas as pd
+
+from planner import SHIFT_LABELS, ShiftPlanner
+
+
+# The per-cell DataFrame loops planner.py used before the grid checks
+def legacy_has_consecutive_same_shifts(df, week_cols, base_idxs):
+    for i in base_idxs:
+        prev = None
+        for col in week_cols:
+            val = df.at[i, col]
+            if val in ("1", "2", "3"):
+                if prev == val:
+                    return True
+                prev = val
+            elif val == "G":
+                prev = None
+    return False
+
+
+def legacy_count_repeat_shifts_for_person(df, week_cols, base_idxs):
+    total_repeats = 0
+    for i in base_idxs:
+        seen = set()
+        for col in week_cols:
+            val = df.at[i, col]
+            if val in ("1", "2", "3"):
+                if val in seen:
+                    total_repeats += 1
+                else:
+                    seen.add(val)
+    return total_repeats
+
+
+def legacy_all_exp_assigned(df, week_cols, base_idxs):
+    for i in base_idxs:
+        if all(df.at[i, col] == "" or df.at[i, col] == "G" for col in week_cols):
+            return False
+    return True
+
+
+def legacy_max_group_spread(df, week_cols, base_idxs):
+    group_cols = ["Experience", "Band", "Domain", "Sub_Domain"]
+    group_map = {}
+    for i in base_idxs:
+        key = tuple(df.loc[i, col] for col in group_cols)
+        group_map.setdefault(key, []).append(i)
+    spread = 0
+    for members in group_map.values():
+        shift_counts = [
+            sum(df.at[i, col] in ("1", "2", "3") for col in week_cols)
+            for i in members
+        ]
+        spread = max(spread, max(shift_counts) - min(shift_counts))
+    return spread
+
+
+def make_planner(employees, weeks, seed):
+    rng = random.Random(seed)
+    planner = ShiftPlanner(db_path=":memory:", output_csv="", num_weeks=weeks)
+    planner.df = pd.DataFrame({
+        "Name": [f"E{i}" for i in range(employees)],
+        "Band": [rng.choice(["Associate", "Layam"]) for _ in range(employees)],
+        "Experience": [rng.randint(1, 3) for _ in range(employees)],
+        "Domain": [rng.choice(["AD-SEL", "FD-SEL"]) for _ in range(employees)],
+        "Sub_Domain": [rng.choice(["Transmission", "Hydraulic"]) for _ in range(employees)],
+    })
+    planner.add_weeks()
+    # Five shifts per week on random people, the rest left empty, as during a retry
+    for wk in range(weeks):
+        for i, code in zip(rng.sample(range(employees), 5), (1, 2, 2, 3, 3)):
+            planner.grid[i, wk] = code
+    return planner
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="planner.py acceptance checks: DataFrame loops vs grid arrays")
+    parser.add_argument("--employees", type=int, default=60)
+    parser.add_argument("--weeks", type=int, default=21)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    planner = make_planner(args.employees, args.weeks, seed=0)
+    week_cols = [f"Week {wk}" for wk in range(1, args.weeks + 1)]
+    base_idxs = list(range(args.employees))
+    group_ids, n_groups = planner.group_ids(base_idxs)
+    planner.materialize_weeks()
+    df = planner.df
+
+    checks = [
+        ("consecutive same shift",
+         lambda: legacy_has_consecutive_same_shifts(df, week_cols, base_idxs),
+         lambda: planner.has_consecutive_same_shifts(week_cols, base_idxs)),
+        ("repeat shift count",
+         lambda: legacy_count_repeat_shifts_for_person(df, week_cols, base_idxs),
+         lambda: planner.count_repeat_shifts_for_person(week_cols, base_idxs)),
+        ("all experienced assigned",
+         lambda: legacy_all_exp_assigned(df, week_cols, base_idxs),
+         lambda: planner.all_exp_assigned(week_cols, base_idxs)),
+        ("max group spread",
+         lambda: legacy_max_group_spread(df, week_cols, base_idxs),
+         lambda: planner.max_group_spread(week_cols, base_idxs, group_ids, n_groups)),
+    ]
+
+    print(f"{args.employees} employees x {args.weeks} weeks, {len(SHIFT_LABELS)} cell codes\n")
+    print(f"{'check':<26}{'loop (ms)':>12}{'array (ms)':>12}{'speedup':>10}  same answer")
+    for name, legacy, vectorized in checks:
+        expected, loop_time = timed(legacy, args.repeat)
+        got, array_time = timed(vectorized, args.repeat)
+        same = expected == got
+        print(f"{name:<26}{loop_time * 1000:>12.3f}{array_time * 1000:>12.3f}"
+              f"{loop_time / array_time:>9.0f}x  {same} ({got})")
+        if not same:
+            raise SystemExit(f"{name}: loop gave {expected!r}, array gave {got!r}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from shift_db import migrate
+
+
+# The lookups the planners issue against ShiftAssignments
+QUERIES = {
+    "recent 1/2/3 (gap check)": ("""
+        SELECT week FROM ShiftAssignments
+        WHERE employee_id = ? AND shift_code IN ('1','2','3') AND week > ?
+    """, lambda eid, week: (eid, week - 5)),
+    "count 1/2/3": ("""
+        SELECT COUNT(*) FROM ShiftAssignments
+        WHERE employee_id = ? AND shift_code IN ('1','2','3')
+    """, lambda eid, week: (eid,)),
+    "last 1/2/3 shift": ("""
+        SELECT shift_code FROM ShiftAssignments
+        WHERE employee_id = ? AND shift_code IN ('1','2','3')
+        ORDER BY week DESC LIMIT 1
+    """, lambda eid, week: (eid,)),
+    "week roster for a shift": ("""
+        SELECT employee_id FROM ShiftAssignments
+        WHERE week = ? AND shift_code = '2'
+    """, lambda eid, week: (week,)),
+}
+
+
+def build_database(path, employees, weeks):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    migrate(conn, target=1)
+    rng = random.Random(0)
+    rows = []
+    for week in range(1, weeks + 1):
+        on_shift = set(rng.sample(range(1, employees + 1), min(employees, 5)))
+        for eid in range(1, employees + 1):
+            rows.append((eid, rng.choice('123') if eid in on_shift else 'G', week))
+    with conn:
+        conn.executemany(
+            "INSERT INTO ShiftAssignments (employee_id, shift_code, week) VALUES (?, ?, ?)",
+            rows
+        )
+    return conn
+
+
+def time_queries(conn, employees, weeks, samples):
+    rng = random.Random(1)
+    probes = [(rng.randint(1, employees), rng.randint(1, weeks)) for _ in range(samples)]
+    results = {}
+    for name, (sql, params) in QUERIES.items():
+        start = time.perf_counter()
+        for eid, week in probes:
+            conn.execute(sql, params(eid, week)).fetchall()
+        results[name] = (time.perf_counter() - start) / samples
+    return results
+
+
+def query_plans(conn):
+    plans = {}
+    for name, (sql, params) in QUERIES.items():
+        rows = conn.execute("EXPLAIN QUERY PLAN " + sql, params(1, 10)).fetchall()
+        plans[name] = "; ".join(row[-1] for row in rows)
+    return plans
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ShiftAssignments query cost before/after the index migration")
+    parser.add_argument("--employees", type=int, default=10000)
+    parser.add_argument("--weeks", type=int, default=104)
+    parser.add_argument("--samples", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        start = time.perf_counter()
+        conn = build_database(path, args.employees, args.weeks)
+        print(f"Built {args.employees * args.weeks} assignment rows "
+              f"({args.employees} employees x {args.weeks} weeks) in {time.perf_counter() - start:.1f}s\n")
+
+        before_plans = query_plans(conn)
+        before = time_queries(conn, args.employees, args.weeks, args.samples)
+
+        start = time.perf_counter()
+        migrate(conn)
+        print(f"Migration (indexes, ANALYZE, stats backfill) took {time.perf_counter() - start:.1f}s\n")
+
+        after_plans = query_plans(conn)
+        after = time_queries(conn, args.employees, args.weeks, args.samples)
+        conn.close()
+
+    print(f"{'query':<28}{'before (ms)':>14}{'after (ms)':>14}{'speedup':>10}")
+    for name in QUERIES:
+        speedup = before[name] / after[name] if after[name] else float('inf')
+        print(f"{name:<28}{before[name] * 1000:>14.3f}{after[name] * 1000:>14.3f}{speedup:>9.0f}x")
+    print("\nQuery plans:")
+    for name in QUERIES:
+        print(f"  {name}\n    before: {before_plans[name]}\n    after:  {after_plans[name]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+import argparse
+import contextlib
+import io
+import os
+import random
+import sqlite3
+import tempfile
+
+from shift import ShiftPlanner, add_costs, iter_bits
+from verify_shifts import validate_db
+
+
+def make_roster(path, employees, seed):
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE Employees (
+            id INTEGER PRIMARY KEY, Name TEXT, Band TEXT, Experience INTEGER, Domain TEXT, Sub_Domain TEXT
+        )
+    """)
+    for i in range(employees):
+        domain = rng.choice(["AD-SEL", "FD-SEL"])
+        sub_domain = rng.choice(["Transmission", "Hydraulics"]) if domain == "FD-SEL" else None
+        conn.execute(
+            "INSERT INTO Employees VALUES (?, ?, ?, ?, ?, ?)",
+            (i + 1, f"E{i}", rng.choice(["Associate", "Layam"]), rng.choice([0, 1, 2, 3]), domain, sub_domain),
+        )
+    conn.commit()
+    conn.close()
+
+
+def slot_costs(planner, week, board, last_domain1, last_subdomain1,
+               last_fd_subdomain2, last_domain3, last_subdomain3):
+    """
+    match_week's objective written out on its own: (broken, relaxed, assoc,
+    starved, short, fresh, load) tuples per slot. Returns the Shift 1, 2 and 3
+    cost functions and the lookahead cost of a Shift 3 Layam next to a Shift 2 pair.
+    """
+    def load(row):
+        return (board.count(row[0]) + 1) ** 2
+
+    def repeated(row, code):
+        return planner.last_shift_masks[code] >> planner.roster_pos[row[0]] & 1
+
+    def broken(row, last_domain, last_subdomain):
+        _, _, _, _, domain, sub_domain = row
+        return int(bool(last_domain and domain == last_domain) or bool(
+            domain == 'FD-SEL' and last_subdomain and sub_domain == last_subdomain))
+
+    def cost1(s1):
+        relaxed = broken(s1, last_domain1, last_subdomain1)
+        return (relaxed, relaxed or repeated(s1, '1'), 0, 0, 0, 0, load(s1))
+
+    def cost2(l1, l2):
+        relaxed = int(bool(last_fd_subdomain2 and l2[5] == last_fd_subdomain2))
+        return (relaxed, relaxed or repeated(l1, '2') or repeated(l2, '2'), 0, 0, 0, 0, load(l1) + load(l2))
+
+    def cost3(a, l):
+        broken_a = broken(a, last_domain3['Associate'], last_subdomain3['Associate'])
+        broken_l = broken(l, last_domain3['Layam'], last_subdomain3['Layam'])
+        return (broken_a + broken_l, int(broken_a or broken_l), broken_a, 0, 0,
+                1 - repeated(l, '2'), load(a) + load(l))
+
+    free_next = {row[0] for row in planner.roster if not planner.assigned_shift_recently(row[0], week + 1)}
+
+    def lookahead(l, l1, l2):
+        others = [row for row in planner.roster
+                  if row[2] == 'Layam' and int(row[3]) > 0 and tuple(row[4:6]) == tuple(l[4:6])
+                  and row not in (l, l1, l2)]
+        if l[4] == 'AD-SEL':
+            need = 5
+        elif l[5] != l2[5]:
+            need = 3
+        else:
+            need = 2
+        starved = need > 2 and not any(row[0] in free_next for row in others)
+        return (0, 0, 0, int(starved), max(0, need - len(others)), 0, 0)
+
+    return cost1, cost2, cost3, lookahead
+
+
+def week_cost(planner, week, board, plan, *lasts):
+    cost1, cost2, cost3, lookahead = slot_costs(planner, week, board, *lasts)
+    s1, (l1, l2), (a, l) = plan
+    return add_costs(cost1(s1), cost2(l1, l2), cost3(a, l), lookahead(l, l1, l2))
+
+
+def brute_force_week(planner, week, board, *lasts):
+    """Cheapest plan over every available person, with no class cut and no pruning."""
+    cost1, cost2, cost3, lookahead = slot_costs(planner, week, board, *lasts)
+    available = [planner.roster[i] for i in iter_bits(planner.available_mask(week))]
+
+    def fits(x, y):
+        return abs(int(x[3]) - int(y[3])) <= 2
+
+    def no_repeat3(row):
+        return not planner.last_shift_masks['3'] >> planner.roster_pos[row[0]] & 1
+
+    associates = [r for r in available if r[2] == 'Associate']
+    layams = [r for r in available if r[2] == 'Layam']
+    # Shift 1 only clashes with the Shift 3 Associate, so its two cheapest cover every pair
+    shift1 = sorted((cost1(s1), s1) for s1 in associates)[:2]
+    shift2 = [(cost2(l1, l2), l1, l2) for l1 in layams if l1[4] == 'AD-SEL'
+              for l2 in layams if l2[4] == 'FD-SEL' and fits(l1, l2)]
+    shift3 = [(cost3(a, l), a, l) for a in associates if no_repeat3(a)
+              for l in layams if no_repeat3(l) and fits(a, l)]
+    best = None
+    for c2, l1, l2 in shift2:
+        for c3, a, l in shift3:
+            if l in (l1, l2):
+                continue
+            c1 = next((c for c, s1 in shift1 if s1 != a), None)
+            if c1 is None:
+                continue
+            total = add_costs(c1, c2, c3, lookahead(l, l1, l2))
+            if best is None or total < best:
+                best = total
+    return best
+
+
+class CheckedPlanner(ShiftPlanner):
+    """Compares every match_week plan with brute_force_week."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checked = []
+
+    def match_week(self, week, board, *lasts):
+        plan = super().match_week(week, board, *lasts)
+        got = week_cost(self, week, board, plan[:3], *lasts) if plan else None
+        self.checked.append((week, got, brute_force_week(self, week, board, *lasts)))
+        return plan
+
+
+def plan_horizon(path, weeks, seed, engine):
+    """Relaxed-alternation warnings and verify_shifts violations of a whole plan."""
+    random.seed(seed)
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        ShiftPlanner(path, weeks=weeks, search_seconds=0, engine=engine).run()
+        violations = validate_db(path)
+    return out.getvalue().count("WARNING: Relaxed"), len(violations)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="shift.py match_week against a brute-force search, and whole plans against the greedy engine"
+    )
+    parser.add_argument("--employees", type=int, nargs="+", default=[60, 80, 100])
+    parser.add_argument("--weeks", type=int, default=21)
+    parser.add_argument("--seeds", type=int, default=5)
+    args = parser.parse_args()
+
+    worse = 0
+    totals = {'greedy': [0, 0], 'matching': [0, 0]}
+    with tempfile.TemporaryDirectory() as tmp:
+        cwd = os.getcwd()
+        os.chdir(tmp)  # run() writes its CSV to the working directory
+        try:
+            for employees in args.employees:
+                for seed in range(args.seeds):
+                    path = os.path.join(tmp, f"roster{employees}_{seed}.db")
+                    make_roster(path, employees, seed)
+                    random.seed(seed)
+                    planner = CheckedPlanner(path, weeks=args.weeks, search_seconds=0, engine='matching')
+                    try:
+                        with contextlib.redirect_stdout(io.StringIO()):
+                            planner.run()
+                    except RuntimeError as e:
+                        print(f"{employees} employees, seed {seed}: skipped ({e})")
+                        continue
+                    misses = [(week, got, best) for week, got, best in planner.checked if got != best]
+                    worse += len(misses)
+                    horizon = {engine: plan_horizon(path, args.weeks, seed, engine) for engine in totals}
+                    for engine, (relaxed, violations) in horizon.items():
+                        totals[engine][0] += relaxed
+                        totals[engine][1] += violations
+                    print(f"{employees} employees, seed {seed}: "
+                          f"{len(planner.checked) - len(misses)} of {len(planner.checked)} weeks optimal; "
+                          + ", ".join(f"{engine} {relaxed} relaxed / {violations} violations"
+                                      for engine, (relaxed, violations) in horizon.items()))
+                    for week, got, best in misses:
+                        print(f"  week {week}: cost {got}, brute force {best}")
+        finally:
+            os.chdir(cwd)
+    for engine, (relaxed, violations) in totals.items():
+        print(f"{engine}: {relaxed} relaxed alternations, {violations} violations")
+    if worse:
+        raise SystemExit(f"match_week missed the optimum in {worse} weeks")
+    if totals['matching'][::-1] > totals['greedy'][::-1]:
+        raise SystemExit("matching plans are worse than greedy over the whole horizon")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import heapq
+import random
+from collections import defaultdict
+
+
+class FairnessScoreboard:
+    """
+    Shift 1/2/3 totals per member, kept as a histogram per group (an
+    experience level, a band/domain pair, ...). A member can sit in several
+    groups. record() moves the member one bucket up or down in each of them
+    in O(1), and the lowest / highest total of each group moves at most one
+    step with it, so spread() and least_loaded() never scan the members.
+    """
+
+    def __init__(self):
+        self.counts = {}
+        self.groups_of = {}
+        # group -> total -> members at that total (dicts keep insertion order)
+        self.buckets = defaultdict(lambda: defaultdict(dict))
+        self.low = {}
+        self.high = {}
+        self.sizes = defaultdict(int)
+        self.sums = defaultdict(int)
+
+    def add_member(self, member, *groups, count=0):
+        self.counts[member] = count
+        self.groups_of[member] = groups
+        for group in groups:
+            self.buckets[group][count][member] = None
+            self.low[group] = min(self.low.get(group, count), count)
+            self.high[group] = max(self.high.get(group, count), count)
+            self.sizes[group] += 1
+            self.sums[group] += count
+
+    def record(self, member, step=1):
+        """Add step (+1 or -1) to the member's total."""
+        old = self.counts[member]
+        new = old + step
+        self.counts[member] = new
+        for group in self.groups_of[member]:
+            buckets = self.buckets[group]
+            del buckets[old][member]
+            buckets[new][member] = None
+            self.sums[group] += step
+            if not buckets[old]:
+                del buckets[old]
+                if self.low[group] == old:
+                    self.low[group] = new
+                if self.high[group] == old:
+                    self.high[group] = new
+            self.low[group] = min(self.low[group], new)
+            self.high[group] = max(self.high[group], new)
+
+    def count(self, member):
+        return self.counts.get(member, 0)
+
+    def lowest(self, group):
+        return self.low[group]
+
+    def highest(self, group):
+        return self.high[group]
+
+    def spread(self, group):
+        return self.high[group] - self.low[group] if group in self.low else 0
+
+    def max_spread(self):
+        return max((self.spread(group) for group in self.low), default=0)
+
+    def size(self, group):
+        return self.sizes[group]
+
+    def total(self, group):
+        return self.sums[group]
+
+    def histogram(self, group):
+        """Total -> number of members, lowest total first."""
+        return {t: len(members) for t, members in sorted(self.buckets[group].items())}
+
+    def least_loaded(self, group):
+        """The longest-waiting member on the group's lowest total."""
+        return next(iter(self.buckets[group][self.low[group]]))
+
+    def by_load(self, group):
+        """The group's members, lowest total first and longest-waiting first within a total."""
+        for total in sorted(self.buckets[group]):
+            yield from self.buckets[group][total]
+
+    def is_least_loaded(self, member, group):
+        return self.counts[member] == self.low[group]
+
+    def groups(self):
+        return list(self.low)
+
+
+class LoadQueue:
+    """
+    Members of one band/domain pool, least-loaded first: a heap of
+    (load, random tiebreak, eligibility week, member) entries. push() files
+    a member under a new key in O(log n) and leaves its old entry behind as
+    stale; walks skip stale entries, and the heap is rebuilt once they
+    outnumber the live ones. Do not push while a walk is being read.
+    """
+
+    def __init__(self):
+        self.heap = []
+        # member -> its live entry
+        self.entries = {}
+
+    def push(self, member, load, eligible_week=0):
+        entry = (load, random.random(), eligible_week, member)
+        self.entries[member] = entry
+        heapq.heappush(self.heap, entry)
+        self._compact()
+
+    def remove(self, member):
+        self.entries.pop(member, None)
+        self._compact()
+
+    def _compact(self):
+        if len(self.heap) > 2 * len(self.entries) + 16:
+            self.heap = list(self.entries.values())
+            heapq.heapify(self.heap)
+
+    def __contains__(self, member):
+        return member in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def walk(self, week=None):
+        """
+        Live entries in key order, skipping members not yet eligible in week.
+        Reads the heap in place through a frontier of heap positions, so
+        taking the first k entries costs O(k log k) and pops nothing.
+        """
+        heap = self.heap
+        frontier = [(heap[0], 0)] if heap else []
+        while frontier:
+            entry, i = heapq.heappop(frontier)
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child], child))
+            if self.entries.get(entry[3]) is not entry:
+                continue
+            if week is None or entry[2] <= week:
+                yield entry
+
+
+class CachedStream:
+    """An iterator read lazily; what was read is kept, so every loop over it starts from the first item."""
+
+    def __init__(self, items):
+        self.items = iter(items)
+        self.seen = []
+
+    def __iter__(self):
+        i = 0
+        while True:
+            if i == len(self.seen):
+                try:
+                    self.seen.append(next(self.items))
+                except StopIteration:
+                    return
+            yield self.seen[i]
+            i += 1
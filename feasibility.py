@@ -0,0 +1,200 @@
+import math
+import sqlite3
+import sys
+from collections import Counter, namedtuple
+
+
+# One rule checked against the roster. hard=False rules only cost alternation
+# or repeat preferences; hard=True rules make the planner fall short.
+Finding = namedtuple("Finding", "rule feasible weeks_covered detail hard")
+
+
+def count_buckets(rows):
+    """
+    Headcount per (band, domain, sub_domain, experience) bucket of the
+    experienced Associates/Layams in rows of (band, domain, sub_domain, exp).
+    """
+    headcounts = Counter()
+    for band, domain, sub_domain, exp in rows:
+        try:
+            exp = int(exp)
+        except (TypeError, ValueError):
+            continue
+        if band in ('Associate', 'Layam') and exp > 0:
+            headcounts[(band, domain, sub_domain, exp)] += 1
+    return headcounts
+
+
+def load_headcounts(cursor):
+    cursor.execute("""
+        SELECT Band, Domain, Sub_Domain, Experience, COUNT(*)
+        FROM Employees
+        GROUP BY Band, Domain, Sub_Domain, Experience
+    """)
+    headcounts = Counter()
+    for band, domain, sub_domain, exp, n in cursor.fetchall():
+        for key in count_buckets([(band, domain, sub_domain, exp)]):
+            headcounts[key] += n
+    return headcounts
+
+
+def pool(headcounts, band=None, domain=None, sub_domain=None):
+    return sum(
+        n for (b, d, s, _), n in headcounts.items()
+        if (band is None or b == band)
+        and (domain is None or d == domain)
+        and (sub_domain is None or s == sub_domain)
+    )
+
+
+def pairable(headcounts, left, right, max_diff=2):
+    """People matching the left filter with at least one right partner within max_diff years (req 11)."""
+    right_exps = {key[3] for key in headcounts if right(key)}
+    return sum(
+        n for key, n in headcounts.items()
+        if left(key) and any(abs(key[3] - exp) <= max_diff for exp in right_exps)
+    )
+
+
+def gap_capacity(people, demand, weeks, gap=5):
+    """
+    Weeks a pool can staff when it must supply `demand` people a week and
+    nobody works twice within `gap` weeks. A pool of at least demand × gap
+    rotates forever; a smaller one runs dry after people // demand weeks.
+    """
+    if people >= math.ceil(demand * gap):
+        return weeks
+    return min(weeks, int(people // demand))
+
+
+def capacity_finding(rule, people, demand, weeks, gap=5, hard=True):
+    covered = gap_capacity(people, demand, weeks, gap)
+    needed = math.ceil(demand * gap)
+    detail = f"{people} people for {demand:g} a week with a {gap}-week gap (needs {needed})"
+    return Finding(rule, covered >= weeks, covered, detail, hard)
+
+
+def pair_finding(rule, left_people, right_people, weeks, hard=True):
+    exists = left_people > 0 and right_people > 0
+    detail = f"{left_people} x {right_people} people with a partner within 2 years of experience"
+    return Finding(rule, exists, weeks if exists else 0, detail, hard)
+
+
+def analyse_shift_rules(headcounts, weeks, gap=5):
+    """
+    Rules of shift.py / shift_planner.py: each week 1 Associate on Shift 1,
+    a Layam AD-SEL + Layam FD-SEL pair on Shift 2 and an Associate + Layam
+    pair on Shift 3, with the 5-week gap and the experience pairs (req 10, 11).
+    """
+    is_assoc = lambda key: key[0] == 'Associate'
+    is_layam = lambda key: key[0] == 'Layam'
+    is_layam_ad = lambda key: is_layam(key) and key[1] == 'AD-SEL'
+    is_layam_fd = lambda key: is_layam(key) and key[1] == 'FD-SEL'
+
+    shift2_ad = pairable(headcounts, is_layam_ad, is_layam_fd)
+    shift2_fd = pairable(headcounts, is_layam_fd, is_layam_ad)
+    shift3_assoc = pairable(headcounts, is_assoc, is_layam)
+    shift3_layam = pairable(headcounts, is_layam, is_assoc)
+
+    findings = [
+        pair_finding("Shift 2 experience pairs (Layam AD-SEL x FD-SEL)", shift2_ad, shift2_fd, weeks),
+        pair_finding("Shift 3 experience pairs (Associate x Layam)", shift3_assoc, shift3_layam, weeks),
+        capacity_finding("Shift 1 + 3 Associates", pool(headcounts, 'Associate'), 2, weeks, gap),
+        capacity_finding("Shift 2 + 3 Layams", pool(headcounts, 'Layam'), 3, weeks, gap),
+        capacity_finding("Shift 2 Layam AD-SEL", shift2_ad, 1, weeks, gap),
+        capacity_finding("Shift 2 Layam FD-SEL", shift2_fd, 1, weeks, gap),
+        capacity_finding("Shift 3 Associates with a Layam partner", shift3_assoc, 1, weeks, gap),
+        capacity_finding("Shift 3 Layams with an Associate partner", shift3_layam, 1, weeks, gap),
+    ]
+    # Domain alternation (req 3, 4, 6): each domain takes every other Shift 1 and Shift 3
+    # slot, and Shift 2 always has one Layam of each domain
+    for domain in ('AD-SEL', 'FD-SEL'):
+        findings.append(capacity_finding(
+            f"Associate {domain} alternation (Shift 1, 3)",
+            pool(headcounts, 'Associate', domain), 1, weeks, gap, hard=False
+        ))
+        findings.append(capacity_finding(
+            f"Layam {domain} alternation (Shift 2, 3)",
+            pool(headcounts, 'Layam', domain), 1.5, weeks, gap, hard=False
+        ))
+    # FD-SEL sub-domain toggle on Shift 2 (req 5), over the sub-domains the roster uses
+    sub_domains = sorted({key[2] for key in headcounts if is_layam_fd(key) and key[2]})
+    if len(sub_domains) < 2:
+        findings.append(Finding(
+            "Shift 2 Layam FD-SEL sub-domain toggle", False, min(weeks, len(sub_domains)),
+            f"{len(sub_domains)} FD-SEL sub-domain(s) among the Layams, needs 2", False
+        ))
+    for sub_domain in sub_domains:
+        findings.append(capacity_finding(
+            f"Shift 2 Layam FD-SEL {sub_domain} toggle",
+            pool(headcounts, 'Layam', 'FD-SEL', sub_domain), 1 / len(sub_domains), weeks, gap, hard=False
+        ))
+    return findings
+
+
+def analyse_planner_rules(headcounts, weeks, repeat_free_hard=False):
+    """
+    Rules of planner.py: 5 shifts a week (1×"1", 2×"2", 2×"3"), every
+    experienced employee on at least one of them, ideally without anyone
+    repeating a shift code (which needs two people per "2"/"3" slot a week).
+    """
+    people = pool(headcounts)
+    slots = 5 * weeks
+    # Every week is still staffed when this fails; some people just never get a shift
+    coverage = Finding(
+        "Every experienced employee gets a shift", people <= slots, weeks,
+        f"{people} experienced employees for {slots} shift slots "
+        f"(needs {math.ceil(people / 5)} weeks)", True
+    )
+    bands = [
+        Finding(f"{band}s on the roster", pool(headcounts, band) > 0,
+                weeks if pool(headcounts, band) > 0 else 0,
+                f"{pool(headcounts, band)} experienced {band}s", True)
+        for band in ('Associate', 'Layam')
+    ]
+    # Nobody takes the same code twice: "2" and "3" each need 2 new people a week
+    repeat_free = Finding(
+        "No repeated shift code per person",
+        people >= 2 * weeks, min(weeks, people // 2),
+        f"{people} experienced employees for 2 new people a week on Shift 2 and 3",
+        repeat_free_hard
+    )
+    return [coverage] + bands + [repeat_free]
+
+
+def report_feasibility(findings, weeks, title="Feasibility check"):
+    """
+    Print one line per rule that cannot be met for all weeks and return the
+    failed hard rules (empty when planning can go ahead).
+    """
+    failed = [f for f in findings if not f.feasible and f.hard]
+    for f in findings:
+        if f.feasible:
+            continue
+        level = "INFEASIBLE" if f.hard else "WARNING"
+        covers = f"; covers {f.weeks_covered} of {weeks} weeks" if f.weeks_covered < weeks else ""
+        print(f"{level}: {f.rule}: {f.detail}{covers}")
+    if failed:
+        print(f"{title}: {len(failed)} hard rule(s) cannot be met for {weeks} weeks")
+    else:
+        print(f"{title}: roster can cover all {weeks} weeks")
+    return failed
+
+
+def infeasible_summary(failed, weeks):
+    covered = min(f.weeks_covered for f in failed)
+    rules = "; ".join(f.rule for f in failed)
+    if covered < weeks:
+        return f"Roster runs out after {covered} of {weeks} weeks: {rules}"
+    return f"Roster cannot satisfy: {rules}"
+
+
+# Check a roster without planning
+if __name__ == "__main__":
+    db_path = sys.argv[1] if len(sys.argv) > 1 else 'SEL_Employess_Data.db'
+    weeks = int(sys.argv[2]) if len(sys.argv) > 2 else 21
+    conn = sqlite3.connect(db_path)
+    headcounts = load_headcounts(conn.cursor())
+    conn.close()
+    report_feasibility(analyse_shift_rules(headcounts, weeks), weeks, "shift.py / shift_planner.py")
+    report_feasibility(analyse_planner_rules(headcounts, weeks), weeks, "planner.py")
@@ -0,0 +1,41 @@
+class GapRing:
+    """
+    Who took a shift 1/2/3 in each of the last `gap` weeks: one roster
+    bitmap per week, in a ring of gap slots that later weeks overwrite.
+    Someone on a shift in week w may not work again before week w + gap,
+    so the people held back in a week are one OR over the ring instead of
+    a check per person.
+
+    A bitmap is anything with |: a Python int bitset (bit i = roster
+    position i) or a NumPy bool array over the rows; `empty` is its zero.
+    """
+
+    def __init__(self, gap=5, empty=0):
+        self.gap = gap
+        self.empty = empty
+        self.weeks = [None] * gap
+        self.masks = [empty] * gap
+
+    def mark(self, week, mask):
+        """Add mask to the people working in week."""
+        slot = week % self.gap
+        if self.weeks[slot] != week:
+            # The slot still holds week - gap (or older); a stale mark is ignored
+            if self.weeks[slot] is not None and self.weeks[slot] > week:
+                return
+            self.weeks[slot] = week
+            self.masks[slot] = self.empty
+        self.masks[slot] = self.masks[slot] | mask
+
+    def blocked(self, week, gap=None):
+        """
+        People who may not take a shift in week: anyone who worked in weeks
+        week - gap + 1 .. week, this week's shifts included. A smaller gap
+        than the ring's relaxes the rule.
+        """
+        gap = self.gap if gap is None else min(gap, self.gap)
+        mask = self.empty
+        for held, week_mask in zip(self.weeks, self.masks):
+            if held is not None and week - gap < held <= week:
+                mask = mask | week_mask
+        return mask
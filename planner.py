@@ -1,7 +1,92 @@
             
 import sqlite3
+import multiprocessing
+import os
+import time
+import numpy as np
 import pandas as pd
 import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Optional
+from feasibility import count_buckets, analyse_planner_rules, report_feasibility, infeasible_summary
+from verify_shifts import validate_grid, print_summary
+from fairness import FairnessScoreboard
+from gap_ring import GapRing
+
+# Cell values of the int8 schedule grid; index = code
+SHIFT_LABELS = ["", "1", "2", "3", "G"]
+EMPTY, SHIFT_1, SHIFT_2, SHIFT_3, SHIFT_G = range(len(SHIFT_LABELS))
+SHIFT_CODE = {label: code for code, label in enumerate(SHIFT_LABELS)}
+
+
+def previous_filled(rows: np.ndarray) -> np.ndarray:
+    """
+    For every cell, the value of the nearest non-empty cell to its left in
+    the same row (EMPTY when there is none).
+    """
+    n_cols = rows.shape[1]
+    pos = np.where(rows != EMPTY, np.arange(n_cols), -1)
+    np.maximum.accumulate(pos, axis=1, out=pos)
+    prev_pos = np.full_like(pos, -1)
+    prev_pos[:, 1:] = pos[:, :-1]
+    prev = np.take_along_axis(rows, np.maximum(prev_pos, 0), axis=1)
+    prev[prev_pos < 0] = EMPTY
+    return prev
+
+
+def consecutive_same_mask(rows: np.ndarray) -> np.ndarray:
+    """
+    True where a shift equals the person's previous shift. Empty cells are
+    skipped and a G in between breaks the run, as in the original loop.
+    """
+    is_shift = (rows >= SHIFT_1) & (rows <= SHIFT_3)
+    return is_shift & (previous_filled(rows) == rows)
+
+
+def shift_histogram(rows: np.ndarray) -> np.ndarray:
+    """Per-row counts of shifts 1, 2 and 3, shape (rows, 3)."""
+    return np.stack([(rows == code).sum(axis=1) for code in (SHIFT_1, SHIFT_2, SHIFT_3)], axis=1)
+
+
+def group_spread(totals: np.ndarray, group_ids: np.ndarray, n_groups: int) -> np.ndarray:
+    """max - min of totals within each group id."""
+    group_max = np.full(n_groups, np.iinfo(np.int64).min)
+    group_min = np.full(n_groups, np.iinfo(np.int64).max)
+    np.maximum.at(group_max, group_ids, totals)
+    np.minimum.at(group_min, group_ids, totals)
+    return group_max - group_min
+
+# Set in each pool process; lets the first perfect schedule stop the other workers
+_stop_event = None
+
+
+def _init_seed_worker(stop_event) -> None:
+    global _stop_event
+    _stop_event = stop_event
+
+
+def _seed_worker(profile: dict, seed: int, deadline: float) -> dict:
+    """
+    One process of the parallel seed search: repeat random_attempt with its
+    own RNG until a zero-repeat schedule, the deadline or a stop from another
+    worker. Only the best score and its int8 rows are sent back.
+    """
+    planner = ShiftPlanner.from_profile(profile, seed)
+    week_cols, base_idxs = profile["week_cols"], profile["base_idxs"]
+    best_score, best_rows, attempts = None, None, 0
+    while True:
+        relaxations = planner.random_attempt(week_cols, base_idxs, profile["pattern"], profile["class_ids"])
+        attempts += 1
+        score = planner.score_schedule(
+            week_cols, base_idxs, profile["group_ids"], profile["n_groups"], relaxations
+        )
+        if best_score is None or score < best_score:
+            best_score = score
+            best_rows = planner.shift_rows(week_cols, base_idxs).tobytes()
+        if best_score[:2] == (0, 0) or time.time() >= deadline or _stop_event.is_set():
+            break
+    return {"seed": seed, "score": best_score, "attempts": attempts, "rows": best_rows}
+
 
 class ShiftPlanner:
     def __init__(
@@ -10,18 +95,42 @@ class ShiftPlanner:
         output_csv: str,
         table_name: str = "Employees",
         num_weeks: int = 21,
+        assign_mode: str = "fair_group",
+        seed: Optional[int] = None,
+        workers: Optional[int] = None,
+        time_budget: float = 30.0,
+        max_attempts: Optional[int] = None,
+        by_class: bool = False,
     ):
         """
         db_path: path to your SEL_Employess_Data.db
         output_csv: path where the final CSV will be saved
         table_name: the table to read (default "Employees")
         num_weeks: how many week columns to add
+        assign_mode: "fair_group", "random", "backtrack" or "parallel" (see assign_exp_shifts)
+        seed: seeds the planner's own RNG (None keeps the global random module)
+        workers: process count for the "parallel" mode
+        time_budget, max_attempts: wall-clock seconds / attempt cap for the
+            "fair_group" and "parallel" searches (max_attempts: fair_group only)
+        by_class: randomize the order of equivalence classes instead of
+            people in those searches (see class_order)
         """
         self.db_path     = db_path
         self.output_csv  = output_csv
         self.table_name  = table_name
         self.num_weeks   = num_weeks
+        self.assign_mode = assign_mode
         self.df          = pd.DataFrame()
+        self.grid        = np.zeros((0, num_weeks), dtype=np.int8)
+        self.rng         = random if seed is None else random.Random(seed)
+        self.workers     = workers
+        self.time_budget = time_budget
+        self.max_attempts = max_attempts
+        self.by_class    = by_class
+        # per-row Band / Domain / Sub_Domain, cached by add_weeks
+        self.band        = []
+        self.domain      = []
+        self.sub_domain  = []
 
         # cycle for shift 1
         self.shift1_cycle = [
@@ -33,6 +142,19 @@ class ShiftPlanner:
         self.shift2_cycle = ["Transmission", "Hydraulic"]
         self.shift3_cycle = ["Hydraulic",    "Transmission"]
 
+    @classmethod
+    def from_profile(cls, profile: dict, seed: Optional[int] = None) -> "ShiftPlanner":
+        """
+        Planner for a parallel-search worker, built from the compact profile
+        (Band / Domain / Sub_Domain lists) instead of the DataFrame.
+        """
+        planner = cls(db_path="", output_csv="", num_weeks=profile["num_weeks"], seed=seed)
+        planner.band = profile["band"]
+        planner.domain = profile["domain"]
+        planner.sub_domain = profile["sub_domain"]
+        planner.grid = np.zeros((len(planner.band), planner.num_weeks), dtype=np.int8)
+        return planner
+
     def load_employees(self) -> None:
         """Read the entire Employees table into a DataFrame."""
         conn = sqlite3.connect(self.db_path)
@@ -41,40 +163,66 @@ class ShiftPlanner:
         finally:
             conn.close()
 
+    def check_feasibility(self) -> None:
+        """
+        Headcount check of the hard rules before searching; raises
+        RuntimeError instead of letting the search loop on a hopeless roster.
+        "random" retries until nobody repeats a shift, so that is hard too.
+        """
+        rows = self.df[["Band", "Domain", "Sub_Domain", "Experience"]].itertuples(index=False, name=None)
+        findings = analyse_planner_rules(
+            count_buckets(rows), self.num_weeks, repeat_free_hard=self.assign_mode == "random"
+        )
+        failed = report_feasibility(findings, self.num_weeks)
+        if failed:
+            raise RuntimeError(infeasible_summary(failed, self.num_weeks))
+
     def add_weeks(self) -> None:
-        """Add Week 1 … Week N columns (empty by default)."""
-        for wk in range(1, self.num_weeks + 1):
-            self.df[f"Week {wk}"] = ""
-            
+        """
+        Allocate the (employees × weeks) int8 schedule grid (all empty).
+        The search works on the grid; the Week 1 … Week N DataFrame columns
+        are only built by materialize_weeks.
+        """
+        self.df = self.df.reset_index(drop=True)
+        self.grid = np.zeros((len(self.df), self.num_weeks), dtype=np.int8)
+        self.band = self.df["Band"].tolist()
+        self.domain = self.df["Domain"].tolist()
+        self.sub_domain = self.df["Sub_Domain"].tolist()
+
+    def materialize_weeks(self) -> None:
+        """Write the grid into Week 1 … Week N columns of the DataFrame."""
+        week_cols = [f"Week {wk}" for wk in range(1, self.num_weeks + 1)]
+        labels = np.array(SHIFT_LABELS, dtype=object)[self.grid]
+        weeks = pd.DataFrame(labels, columns=week_cols, index=self.df.index)
+        self.df = pd.concat([self.df.drop(columns=week_cols, errors="ignore"), weeks], axis=1)
+
     def check_exp_never_assigned(self):
         """
         Print a warning for any experienced employee who never got a shift.
         """
-        week_cols = [f"Week {wk}" for wk in range(1, self.num_weeks + 1)]
         exp = pd.to_numeric(self.df["Experience"], errors="coerce").fillna(0)
         exp_idxs = self.df.index[exp > 0].tolist()
-        for i in exp_idxs:
-            if all(self.df.at[i, col] == "" or self.df.at[i, col] == "G" for col in week_cols):
-                print(f"Warning: Employee {self.df.at[i, 'Name']} (index {i}) never assigned a shift.")
+        never = shift_histogram(self.grid[exp_idxs]).sum(axis=1) == 0
+        for i in np.asarray(exp_idxs, dtype=np.intp)[never]:
+            print(f"Warning: Employee {self.df.at[i, 'Name']} (index {i}) never assigned a shift.")
 
     def assign_zero_exp_shift(self) -> None:
         """
         For every employee whose `Experience` == 0,
         fill all Week columns with "G" (the G shift).
         """
-        week_cols = [f"Week {wk}" for wk in range(1, self.num_weeks + 1)]
         if "Experience" not in self.df.columns:
             return
         exp  = pd.to_numeric(self.df["Experience"], errors="coerce").fillna(-1)
-        mask = exp == 0
-        self.df.loc[mask, week_cols] = "G"
+        mask = (exp == 0).to_numpy()
+        self.grid[mask, :] = SHIFT_G
 
     def choose_shift1_associate(self, idxs: list[int], wk_num: int) -> list[int]:
         """
         Pick one Associate for shift "1" according to shift1_cycle.
         Move that index to position 0 so it receives "1".
         """
-        assoc = [i for i in idxs if self.df.at[i, "Band"] == "Associate"]
+        assoc = [i for i in idxs if self.band[i] == "Associate"]
         if not assoc:
             return idxs
 
@@ -83,14 +231,14 @@ class ShiftPlanner:
         if sd is not None:
             sel = next(
                 (i for i in assoc
-                 if self.df.at[i, "Domain"]     == dom and
-                    self.df.at[i, "Sub_Domain"] == sd),
+                 if self.domain[i]     == dom and
+                    self.sub_domain[i] == sd),
                 None
             )
         if sel is None:
             sel = next(
                 (i for i in assoc
-                 if self.df.at[i, "Domain"] == dom),
+                 if self.domain[i] == dom),
                 None
             )
         if sel is None:
@@ -106,7 +254,7 @@ class ShiftPlanner:
         """
         first  = idxs[0]
         others = idxs[1:]
-        layam  = [i for i in others if self.df.at[i, "Band"] == "Layam"]
+        layam  = [i for i in others if self.band[i] == "Layam"]
         if len(layam) < 2:
             return idxs
 
@@ -115,13 +263,13 @@ class ShiftPlanner:
 
         # slot2 = Layam with that sub-domain (or fallback to any Layam)
         slot2 = next((i for i in layam
-                      if self.df.at[i, "Sub_Domain"] == desired2),
+                      if self.sub_domain[i] == desired2),
                      layam[0])
 
         # slot1 = Layam ≠ slot2 and different Domain
         cand1 = [i for i in layam
                  if i != slot2 and
-                    self.df.at[i, "Domain"] != self.df.at[slot2, "Domain"]]
+                    self.domain[i] != self.domain[slot2]]
         slot1 = cand1[0] if cand1 else next(i for i in layam if i != slot2)
 
         rest = [i for i in others if i not in (slot1, slot2)]
@@ -140,115 +288,158 @@ class ShiftPlanner:
         desired4 = self.shift3_cycle[(wk_num - 1) % len(self.shift3_cycle)]
 
         # pools
-        assoc = [i for i in tail if self.df.at[i, "Band"] == "Associate"]
-        layam = [i for i in tail if self.df.at[i, "Band"] == "Layam"]
+        assoc = [i for i in tail if self.band[i] == "Associate"]
+        layam = [i for i in tail if self.band[i] == "Layam"]
         if not assoc or not layam:
             return idxs  # fallback
 
         # pick slot-4 from Layam with desired Sub_Domain
         slot4 = next(
             (i for i in layam
-             if self.df.at[i, "Sub_Domain"] == desired4),
+             if self.sub_domain[i] == desired4),
             layam[0]
         )
         # pick slot-3 from Associate with opposite Domain
         slot3 = next(
             (i for i in assoc
-             if self.df.at[i, "Domain"] != self.df.at[slot4, "Domain"]),
+             if self.domain[i] != self.domain[slot4]),
             assoc[0]
         )
 
         rest = [i for i in tail if i not in (slot3, slot4)]
         return head + [slot3, slot4] + rest
     
+    def shift_rows(self, week_cols, base_idxs) -> np.ndarray:
+        """Grid rows of base_idxs restricted to the given week columns."""
+        return self.grid[np.asarray(base_idxs, dtype=np.intp), :len(week_cols)]
+
     def has_consecutive_same_shifts(self, week_cols, base_idxs):
         """
         Returns True if any person has the same shift number in consecutive weeks.
         """
-        for i in base_idxs:
-            prev = None
-            for col in week_cols:
-                val = self.df.at[i, col]
-                if val in ("1", "2", "3"):
-                    if prev == val:
-                        return True
-                    prev = val
-                elif val == "G":
-                    prev = None  # treat G as a break
-        return False
-    
+        return bool(consecutive_same_mask(self.shift_rows(week_cols, base_idxs)).any())
+
     def has_repeat_shift_for_person(self, week_cols, base_idxs):
         """
         Returns True if any person is assigned the same shift number as any of their previous assignments (excluding 'G').
         """
-        for i in base_idxs:
-            seen = set()
-            for col in week_cols:
-                val = self.df.at[i, col]
-                if val in ("1", "2", "3"):
-                    if val in seen:
-                        return True
-                    seen.add(val)
-        return False
-    
+        return bool((shift_histogram(self.shift_rows(week_cols, base_idxs)) > 1).any())
+
     def count_repeat_shifts_for_person(self, week_cols, base_idxs):
         """
         Returns the total number of repeat shift assignments for all persons.
         """
-        total_repeats = 0
-        for i in base_idxs:
-            seen = set()
-            for col in week_cols:
-                val = self.df.at[i, col]
-                if val in ("1", "2", "3"):
-                    if val in seen:
-                        total_repeats += 1
-                    else:
-                        seen.add(val)
-        return total_repeats
-    
+        counts = shift_histogram(self.shift_rows(week_cols, base_idxs))
+        return int(np.maximum(counts - 1, 0).sum())
+
+    def all_exp_assigned(self, week_cols, base_idxs) -> bool:
+        """True if every person in base_idxs has at least one shift 1/2/3."""
+        return bool((shift_histogram(self.shift_rows(week_cols, base_idxs)).sum(axis=1) > 0).all())
+
+    def group_ids(self, base_idxs) -> tuple[np.ndarray, int]:
+        """Dense ids of the (Experience, Band, Domain, Sub_Domain) group of each of base_idxs."""
+        group_cols = ["Experience", "Band", "Domain", "Sub_Domain"]
+        ids = self.df.loc[base_idxs].groupby(group_cols, dropna=False, sort=False).ngroup()
+        return ids.to_numpy(), int(ids.max()) + 1 if len(ids) else 0
+
+    def max_group_spread(self, week_cols, base_idxs, group_ids, n_groups) -> int:
+        """Largest max-min of total shifts 1/2/3 within any group."""
+        totals = shift_histogram(self.shift_rows(week_cols, base_idxs)).sum(axis=1)
+        return int(group_spread(totals, group_ids, n_groups).max()) if n_groups else 0
+
+    def class_order(self, classes, load, last_assigned) -> list[int]:
+        """
+        One week's candidate order when planning over equivalence classes:
+        the classes in random order, each one's members round-robin (fewest
+        shifts, then longest since the last one), interleaved by rank. The
+        choose_* helpers take the first match, so they pick a class at
+        random and then its least-loaded member.
+        """
+        keys = list(classes)
+        self.rng.shuffle(keys)
+        queues = [
+            sorted(classes[c], key=lambda i: (load.get(i, 0), last_assigned.get(i, 0)))
+            for c in keys
+        ]
+        depth = max(map(len, queues), default=0)
+        return [q[rank] for rank in range(depth) for q in queues if rank < len(q)]
+
+    def random_attempt(self, week_cols, base_idxs, pattern, class_ids=None) -> int:
+        """
+        Clear the grid and build one randomized schedule for base_idxs.
+        class_ids (see group_ids) switches to class_order for the weekly order.
+        Returns the number of weeks that had to relax the 5-week gap.
+        """
+        self.grid.fill(EMPTY)
+
+        # One bool row per recent week: who worked it, for the 5-week gap
+        gap_ring = GapRing(5, np.zeros(len(self.grid), dtype=bool))
+        last_assigned: dict[int, int] = {}
+        load: dict[int, int] = {}
+        relaxations = 0
+        classes: dict[int, list[int]] = {}
+        if class_ids is not None:
+            for i, c in zip(base_idxs, class_ids):
+                classes.setdefault(c, []).append(i)
+
+        for wk_num, col in enumerate(week_cols, start=1):
+            if classes:
+                idxs = self.class_order(classes, load, last_assigned)
+            else:
+                idxs = base_idxs.copy()
+                self.rng.shuffle(idxs)  # Randomize order each week
+
+            # pick only those with at least a gap of 5, else 4, else 3
+            order = np.asarray(idxs, dtype=np.intp)
+            for gap in (5, 4, 3):
+                elig = order[~gap_ring.blocked(wk_num, gap)[order]]
+                if len(elig) >= len(pattern):
+                    idxs = elig.tolist()
+                    break
+            else:
+                idxs = idxs[:]
+            if gap < 5:
+                relaxations += 1
+
+            idxs = self.choose_shift1_associate(idxs, wk_num)
+            idxs = self.choose_shift2_layam(idxs, wk_num)
+            idxs = self.choose_shift3_associates(idxs, wk_num)
+
+            # assign shifts and record assignment week
+            worked = np.zeros(len(self.grid), dtype=bool)
+            for i, shift in zip(idxs, pattern):
+                self.grid[i, wk_num - 1] = SHIFT_CODE[shift]
+                last_assigned[i] = wk_num
+                load[i] = load.get(i, 0) + 1
+                worked[i] = True
+            gap_ring.mark(wk_num, worked)
+
+        return relaxations
+
+    def score_schedule(self, week_cols, base_idxs, group_ids, n_groups, relaxations) -> tuple:
+        """
+        Lexicographic score of the current grid, lower is better:
+        (uncovered + consecutive-same violations, repeats, fairness spread, relaxations).
+        """
+        rows = self.shift_rows(week_cols, base_idxs)
+        uncovered = int((shift_histogram(rows).sum(axis=1) == 0).sum())
+        consecutive = int(consecutive_same_mask(rows).sum())
+        repeats = self.count_repeat_shifts_for_person(week_cols, base_idxs)
+        spread = self.max_group_spread(week_cols, base_idxs, group_ids, n_groups)
+        return (uncovered + consecutive, repeats, spread, relaxations)
+
     def randomize_exp_shift_assignment(self, week_cols, base_idxs, pattern):
         """
         Randomly assign experienced employees to shifts each week,
         ensuring each week has 1×"1", 2×"2", 2×"3" and
         all experienced employees get at least one shift in the schedule.
         """
+        class_ids = self.group_ids(base_idxs)[0] if self.by_class else None
         while True:
-            # Clear previous assignments
-            for col in week_cols:
-                self.df.loc[:, col] = ""
-
-            last_assigned: dict[int, int] = {}
-
-            for wk_num, col in enumerate(week_cols, start=1):
-                idxs = base_idxs.copy()
-                random.shuffle(idxs)  # Randomize order each week
-
-                # pick only those with at least a gap of 5, else 4, else 3
-                for gap in (5, 4, 3):
-                    elig = [i for i in idxs if wk_num - last_assigned.get(i, 0) >= gap]
-                    if len(elig) >= len(pattern):
-                        idxs = elig.copy()
-                        break
-                else:
-                    idxs = idxs[:]
-
-                idxs = self.choose_shift1_associate(idxs, wk_num)
-                idxs = self.choose_shift2_layam(idxs, wk_num)
-                idxs = self.choose_shift3_associates(idxs, wk_num)
-
-                # assign shifts and record assignment week
-                for i, shift in zip(idxs, pattern):
-                    self.df.at[i, col] = shift
-                    last_assigned[i] = wk_num
+            self.random_attempt(week_cols, base_idxs, pattern, class_ids)
 
             # Check if all experienced employees have at least one shift
-            all_assigned = True
-            for i in base_idxs:
-                if all(self.df.at[i, col] == "" or self.df.at[i, col] == "G" for col in week_cols):
-                    all_assigned = False
-                    break
-            if not all_assigned:
+            if not self.all_exp_assigned(week_cols, base_idxs):
                 continue
             
             # Check for consecutive same shifts
@@ -260,169 +451,292 @@ class ShiftPlanner:
                 
             break
             
-    def fair_group_shift_assignment(self, week_cols, base_idxs, pattern):
+    def fair_group_shift_assignment(self, week_cols, base_idxs, pattern, time_budget=None, max_attempts=None):
         """
         Assign shifts so that for every group with the same (Experience, Band, Domain, Sub_Domain),
         each member gets almost the same number of shifts, while fulfilling all shift constraints.
+
+        Anytime search: keeps the best schedule seen and stops on a perfect one
+        (full coverage, no consecutive repeats, spread ≤ 1, zero repeats) or
+        when the wall-clock / attempt budget runs out.
         """
-        group_cols = ["Experience", "Band", "Domain", "Sub_Domain"]
-        group_map = {}
-        for i in base_idxs:
-            key = tuple(self.df.loc[i, col] for col in group_cols)
-            group_map.setdefault(key, []).append(i)
+        time_budget = self.time_budget if time_budget is None else time_budget
+        max_attempts = self.max_attempts if max_attempts is None else max_attempts
+        group_ids, n_groups = self.group_ids(base_idxs)
+        idx_array = np.asarray(base_idxs, dtype=np.intp)
+        class_ids = group_ids if self.by_class else None
 
+        best_key, best_score, best_rows = None, None, None
+        attempts = 0
+        start = time.perf_counter()
         while True:
-            # Clear previous assignments
-            for col in week_cols:
-                self.df.loc[:, col] = ""
-
-            last_assigned: dict[int, int] = {}
-
-            for wk_num, col in enumerate(week_cols, start=1):
-                idxs = base_idxs.copy()
-                random.shuffle(idxs)
-
-                # pick only those with at least a gap of 5, else 4, else 3
-                for gap in (5, 4, 3):
-                    elig = [i for i in idxs if wk_num - last_assigned.get(i, 0) >= gap]
-                    if len(elig) >= len(pattern):
-                        idxs = elig.copy()
-                        break
-                else:
-                    idxs = idxs[:]
-
-                idxs = self.choose_shift1_associate(idxs, wk_num)
-                idxs = self.choose_shift2_layam(idxs, wk_num)
-                idxs = self.choose_shift3_associates(idxs, wk_num)
-
-                # assign shifts and record assignment week
-                for i, shift in zip(idxs, pattern):
-                    self.df.at[i, col] = shift
-                    last_assigned[i] = wk_num
-
-            # Check all experienced employees have at least one shift
-            all_assigned = True
-            for i in base_idxs:
-                if all(self.df.at[i, col] == "" or self.df.at[i, col] == "G" for col in week_cols):
-                    all_assigned = False
-                    break
-            if not all_assigned:
-                continue
-
-            # Check fairness: for each group, max-min assigned shifts ≤ 1
-            fair = True
-            for members in group_map.values():
-                shift_counts = [
-                    sum(self.df.at[i, col] in ("1", "2", "3") for col in week_cols)
-                    for i in members
-                ]
-                if max(shift_counts) - min(shift_counts) > 1:
-                    fair = False
-                    break
-            if not fair:
-                continue
-            
-            # Check for consecutive same shifts
-            if self.has_consecutive_same_shifts(week_cols, base_idxs):
-                continue
-
-            # Count repeat shifts for person (relaxed)
-            repeats = self.count_repeat_shifts_for_person(week_cols, base_idxs)
-            if repeats < min_repeats:
-                # Save the best assignment so far
-                min_repeats = repeats
-                best_assignment = self.df[week_cols].copy()
-                if repeats == 0:
+            relaxations = self.random_attempt(week_cols, base_idxs, pattern, class_ids)
+            attempts += 1
+
+            # Coverage and consecutive shifts first, then fairness (max-min ≤ 1), then repeats
+            score = self.score_schedule(week_cols, base_idxs, group_ids, n_groups, relaxations)
+            violations, repeats, spread, _ = score
+            key = (violations, spread > 1, repeats, spread, relaxations)
+            if best_key is None or key < best_key:
+                best_key, best_score = key, score
+                best_rows = self.shift_rows(week_cols, base_idxs).copy()
+                if key[:3] == (0, False, 0):
                     break  # Can't do better than zero
 
-        # Restore the best assignment found
-        if best_assignment is not None:
-            for col in week_cols:
-                self.df[col] = best_assignment[col]
-
-            # # Check for repeat shift for person
-            # if self.has_repeat_shift_for_person(week_cols, base_idxs):
-            #     continue
+            elapsed = time.perf_counter() - start
+            if elapsed >= time_budget or (max_attempts and attempts >= max_attempts):
+                break
 
-    def assign_exp_shifts(self, fair_group=True) -> None:
-        """
-        For employees with Experience > 0, assign each week:
-          1×"1", 2×"2", and 2×"3"
-        with Shift-1 via choose_shift1_associate,
-        Shift-2 via choose_shift2_layam,
-        Shift-3 via choose_shift3_associates.
-        Uses randomization to ensure fairness and coverage.
-        """
-        week_cols = [f"Week {wk}" for wk in range(1, self.num_weeks + 1)]
-        exp = pd.to_numeric(self.df["Experience"], errors="coerce").fillna(0)
-        base_idxs = self.df.index[exp > 0].tolist()
-        pattern = ["1", "2", "2", "3", "3"]
+        # Restore the best assignment found
+        self.grid[idx_array, :len(week_cols)] = best_rows
 
-        if fair_group:
-            self.fair_group_shift_assignment(week_cols, base_idxs, pattern)
+        elapsed = time.perf_counter() - start
+        violations, repeats, spread, relaxations = best_score
+        used = f"{elapsed:.1f}s of {time_budget:.0f}s"
+        if max_attempts:
+            used += f", {attempts} of {max_attempts} attempts"
         else:
-            self.randomize_exp_shift_assignment(week_cols, base_idxs, pattern)
-
-    def enforce_pair_alternation(self, idxs, pos_a, pos_b):
-        """
-        Ensure idxs[pos_a] & idxs[pos_b] come from different Domains.
-        Swap in a later row if needed.
+            used += f", {attempts} attempts"
+        print(f"fair_group: best schedule after {used} "
+              f"(repeats {repeats}, spread {spread}, relaxed weeks {relaxations})")
+        if violations or spread > 1:
+            print(f"WARNING: budget ran out before a fair schedule was found "
+                  f"({violations} coverage / consecutive-shift violations, spread {spread})")
+
+    def parallel_seed_search(self, week_cols, base_idxs, pattern, workers=None, time_budget=30.0):
+        """
+        Run random_attempt in `workers` processes, each with its own seed.
+        The first zero-repeat schedule wins; otherwise the best score
+        (see score_schedule) seen by any worker when time_budget runs out.
+        """
+        workers = workers or os.cpu_count() or 1
+        group_ids, n_groups = self.group_ids(base_idxs)
+        profile = {
+            "num_weeks": self.num_weeks,
+            "week_cols": week_cols,
+            "base_idxs": base_idxs,
+            "pattern": pattern,
+            "band": self.band,
+            "domain": self.domain,
+            "sub_domain": self.sub_domain,
+            "group_ids": group_ids,
+            "n_groups": n_groups,
+            "class_ids": group_ids if self.by_class else None,
+        }
+        base_seed = self.rng.randrange(2**32)
+        deadline = time.time() + time_budget
+        context = multiprocessing.get_context()
+        stop_event = context.Event()
+
+        best, attempts = None, 0
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=_init_seed_worker,
+            initargs=(stop_event,),
+        ) as pool:
+            futures = [
+                pool.submit(_seed_worker, profile, base_seed + k, deadline)
+                for k in range(workers)
+            ]
+            for future in as_completed(futures):
+                result = future.result()
+                attempts += result["attempts"]
+                if best is None or result["score"] < best["score"]:
+                    best = result
+                if result["score"][:2] == (0, 0):
+                    stop_event.set()
+
+        rows = np.frombuffer(best["rows"], dtype=np.int8).reshape(len(base_idxs), len(week_cols))
+        self.grid[np.asarray(base_idxs, dtype=np.intp), :len(week_cols)] = rows
+
+        violations, repeats, spread, relaxations = best["score"]
+        print(f"Parallel search: seed {best['seed']} won after {attempts} attempts on {workers} workers "
+              f"(repeats {repeats}, spread {spread}, relaxed weeks {relaxations})")
+        if violations:
+            print(f"WARNING: best schedule still has {violations} coverage / consecutive-shift violations")
+
+    def backtrack_shift_assignment(
+        self,
+        week_cols,
+        base_idxs,
+        max_nodes: int = 5000,
+        restarts: int = 20,
+    ):
         """
-        if pos_a >= len(idxs) or pos_b >= len(idxs):
-            return idxs
-        a, b = idxs[pos_a], idxs[pos_b]
-        if self.df.at[a, "Domain"] == self.df.at[b, "Domain"]:
-            for j in range(pos_b + 1, len(idxs)):
-                if self.df.at[idxs[j], "Domain"] != self.df.at[a, "Domain"]:
-                    idxs[pos_b], idxs[j] = idxs[j], idxs[pos_b]
+        Build the schedule week by week, one slot at a time, checking the
+        gap, consecutive-shift, repeat-shift, group-fairness and coverage
+        rules as each slot is filled and backtracking to the most recent
+        slot when a rule cannot be met.
+
+        Each relaxation level gets `restarts` searches (with fresh random
+        tie-breaks) of at most `max_nodes` placements each, so the run time
+        is bounded; levels loosen the rules in the same order the random
+        planners do (repeats, then fairness, then the 5-week gap).
+        """
+        levels = [
+            {"gap": 5, "repeats": False, "fair": True},
+            {"gap": 5, "repeats": True,  "fair": True},
+            {"gap": 5, "repeats": True,  "fair": False},
+            {"gap": 4, "repeats": True,  "fair": False},
+            {"gap": 3, "repeats": True,  "fair": False},
+        ]
+        for level, rules in enumerate(levels):
+            for _ in range(restarts):
+                chosen = self._backtrack_search(week_cols, base_idxs, max_nodes=max_nodes, **rules)
+                if chosen is not None:
                     break
-        return idxs
+            else:
+                continue
+            if level:
+                print(f"WARNING: Backtracking relaxed to gap {rules['gap']}, "
+                      f"repeats {'allowed' if rules['repeats'] else 'forbidden'}, "
+                      f"group fairness {'on' if rules['fair'] else 'off'}")
+            self.grid[base_idxs, :] = EMPTY
+            for (wk_idx, shift), i in chosen:
+                self.grid[i, wk_idx] = SHIFT_CODE[shift]
+            return
+        raise RuntimeError(
+            f"Backtracking found no schedule within {restarts} x {max_nodes} placements per relaxation level"
+        )
 
-    def enforce_subdomain_toggle(self, idxs, pos_a, pos_b, desired_sub):
+    def _backtrack_search(self, week_cols, base_idxs, gap, repeats, fair, max_nodes):
         """
-        After domain alternation, ensure idxs[pos_b] has Sub_Domain == desired_sub.
-        Swap in a later row if needed.
+        Depth-first search over the weekly slots. Returns a list of
+        ((week index, shift), employee index) or None when the node budget
+        runs out or the rules cannot be met.
         """
-        if pos_a >= len(idxs) or pos_b >= len(idxs):
-            return idxs
-        a, b = idxs[pos_a], idxs[pos_b]
-        if self.df.at[b, "Sub_Domain"] == desired_sub:
-            return idxs
-
-        domain_a = self.df.at[a, "Domain"]
-        for j in range(pos_b + 1, len(idxs)):
-            cand = idxs[j]
-            if (
-                self.df.at[cand, "Domain"]     != domain_a and
-                self.df.at[cand, "Sub_Domain"] == desired_sub
-            ):
-                idxs[pos_b], idxs[j] = idxs[j], idxs[pos_b]
-                break
-        return idxs
+        # Fill order mirrors the choose_* helpers: shift 1, the shift-2
+        # sub-domain slot then its partner, the shift-3 Layam then its Associate.
+        slot_specs = [("1", "Associate"), ("2", "Layam"), ("2", "Layam"), ("3", "Layam"), ("3", "Associate")]
+        slots = [(wk_idx, k) for wk_idx in range(len(week_cols)) for k in range(len(slot_specs))]
 
-    def print_data(self) -> None:
-        """Dump the resulting DataFrame to stdout."""
-        print(self.df.to_string(index=False))
-
-    def save_csv(self) -> None:
-        """Save the DataFrame to CSV (no index)."""
-        self.df.to_csv(self.output_csv, index=False)
-
-    def run(self) -> None:
-        """Do everything in order, without touching the DB."""
-        self.load_employees()
-        self.add_weeks()
-        self.assign_zero_exp_shift()
-        self.assign_exp_shifts()
-        # fill any remaining empty slots with "G"
-        for wk in range(1, self.num_weeks + 1):
-            col = f"Week {wk}"
-            self.df.loc[self.df[col] == "", col] = "G"
-            self.check_exp_never_assigned()
-        self.print_data()
-        self.save_csv()
-
-    def assign_exp_shifts(self, fair_group=True) -> None:
+        band = {i: self.band[i] for i in base_idxs}
+        domain = {i: self.domain[i] for i in base_idxs}
+        sub = {i: self.sub_domain[i] for i in base_idxs}
+        group_cols = ["Experience", "Band", "Domain", "Sub_Domain"]
+        group = {i: tuple(self.df.at[i, col] for col in group_cols) for i in base_idxs}
+        board = FairnessScoreboard()
+        for i in base_idxs:
+            board.add_member(i, group[i])
+        by_band = {b: [i for i in base_idxs if band[i] == b] for b in ("Associate", "Layam")}
+
+        # Slots still open for each band from a given depth on (coverage pruning)
+        open_slots = {b: [0] * (len(slots) + 1) for b in by_band}
+        for depth in range(len(slots) - 1, -1, -1):
+            slot_band = slot_specs[slots[depth][1]][1]
+            for b in by_band:
+                open_slots[b][depth] = open_slots[b][depth + 1] + (slot_band == b)
+        uncovered = {b: len(members) for b, members in by_band.items()}
+
+        last_week = {i: -gap for i in base_idxs}
+        last_shift = {i: None for i in base_idxs}
+        seen = {i: set() for i in base_idxs}
+        chosen = [None] * len(slots)
+        trail = [None] * len(slots)
+
+        def candidates(depth):
+            wk_idx, k = slots[depth]
+            wk_num = wk_idx + 1
+            shift, slot_band = slot_specs[k]
+            tight = uncovered[slot_band] >= open_slots[slot_band][depth] - len(slot_specs)
+            result = []
+            for i in by_band[slot_band]:
+                if wk_idx - last_week[i] < gap:
+                    continue
+                if last_shift[i] == shift:
+                    continue
+                if not repeats and shift in seen[i]:
+                    continue
+                if fair and not board.is_least_loaded(i, group[i]):
+                    continue
+                if k == 2 and domain[i] == domain[chosen[depth - 1]]:
+                    continue
+                # Soft preferences from shift1_cycle / shift2_cycle / shift3_cycle
+                if k == 0:
+                    dom, sd = self.shift1_cycle[(wk_num - 1) % len(self.shift1_cycle)]
+                    pref = 0 if domain[i] == dom and (sd is None or sub[i] == sd) else 1 if domain[i] == dom else 2
+                elif k == 1:
+                    pref = 0 if sub[i] == self.shift2_cycle[(wk_num - 1) % len(self.shift2_cycle)] else 1
+                elif k == 3:
+                    pref = 0 if sub[i] == self.shift3_cycle[(wk_num - 1) % len(self.shift3_cycle)] else 1
+                elif k == 4:
+                    pref = 0 if domain[i] != domain[chosen[depth - 1]] else 1
+                else:
+                    pref = 0
+                # With the no-consecutive rule, fresh people are the only ones who can take
+                # either shift, so keep them back until coverage gets tight
+                fresh = board.count(i) == 0
+                result.append((fresh != tight, pref, board.count(i), last_week[i], self.rng.random(), i))
+            result.sort()
+            return [i for *_, i in result]
+
+        def place(depth, i):
+            wk_idx, k = slots[depth]
+            shift = slot_specs[k][0]
+            trail[depth] = (last_week[i], last_shift[i], shift in seen[i])
+            chosen[depth] = i
+            board.record(i)
+            if board.count(i) == 1:
+                uncovered[band[i]] -= 1
+            last_week[i] = wk_idx
+            last_shift[i] = shift
+            seen[i].add(shift)
+
+        def unplace(depth):
+            i = chosen[depth]
+            shift = slot_specs[slots[depth][1]][0]
+            last_week[i], last_shift[i], had_shift = trail[depth]
+            if not had_shift:
+                seen[i].discard(shift)
+            if board.count(i) == 1:
+                uncovered[band[i]] += 1
+            board.record(i, -1)
+            chosen[depth] = None
+
+        def covered_in_time(depth):
+            return all(uncovered[b] <= open_slots[b][depth] for b in by_band)
+
+        # Without repeats each person can take each shift at most once
+        per_week = {b: {shift: 0 for shift, _ in slot_specs} for b in by_band}
+        for shift, slot_band in slot_specs:
+            per_week[slot_band][shift] += 1
+        if not repeats and any(
+            len(by_band[b]) < n * len(week_cols) for b in by_band for n in per_week[b].values()
+        ):
+            return None
+        if not covered_in_time(0):
+            return None
+        options = [candidates(0)]
+        pointer = [0]
+        nodes = 0
+        depth = 0
+        while depth < len(slots):
+            if nodes >= max_nodes:
+                return None
+            if pointer[depth] < len(options[depth]):
+                i = options[depth][pointer[depth]]
+                pointer[depth] += 1
+                place(depth, i)
+                nodes += 1
+                if not covered_in_time(depth + 1):
+                    unplace(depth)
+                    continue
+                depth += 1
+                if depth < len(slots):
+                    options.append(candidates(depth))
+                    pointer.append(0)
+            else:
+                options.pop()
+                pointer.pop()
+                depth -= 1
+                if depth < 0:
+                    return None
+                unplace(depth)
+
+        return [((slots[d][0], slot_specs[slots[d][1]][0]), chosen[d]) for d in range(len(slots))]
+
+    def assign_exp_shifts(self, fair_group=True, mode=None) -> None:
         """
         For employees with Experience > 0, assign each week:
           1×"1", 2×"2", and 2×"3"
@@ -430,16 +744,32 @@ class ShiftPlanner:
         Shift-2 via choose_shift2_layam,
         Shift-3 via choose_shift3_associates.
         Uses randomization to ensure fairness and coverage.
+
+        mode: "fair_group", "random", "backtrack" or "parallel"; when None it follows
+        fair_group (and then the assign_mode given to the constructor).
         """
         week_cols = [f"Week {wk}" for wk in range(1, self.num_weeks + 1)]
         exp = pd.to_numeric(self.df["Experience"], errors="coerce").fillna(0)
         base_idxs = self.df.index[exp > 0].tolist()
         pattern = ["1", "2", "2", "3", "3"]
 
-        if fair_group:
+        if mode is None:
+            mode = self.assign_mode if fair_group else "random"
+        if self.by_class and mode != "backtrack":
+            print(f"Planning over {self.group_ids(base_idxs)[1]} equivalence classes "
+                  f"for {len(base_idxs)} experienced employees")
+        if mode == "backtrack":
+            self.backtrack_shift_assignment(week_cols, base_idxs)
+        elif mode == "parallel":
+            self.parallel_seed_search(
+                week_cols, base_idxs, pattern, self.workers, self.time_budget
+            )
+        elif mode == "fair_group":
             self.fair_group_shift_assignment(week_cols, base_idxs, pattern)
-        else:
+        elif mode == "random":
             self.randomize_exp_shift_assignment(week_cols, base_idxs, pattern)
+        else:
+            raise ValueError(f"Unknown assignment mode: {mode!r}")
 
     def enforce_pair_alternation(self, idxs, pos_a, pos_b):
         """
@@ -478,8 +808,19 @@ class ShiftPlanner:
                 break
         return idxs
 
+    def post_check(self) -> list:
+        """Run verify_shifts' rules on the finished grid in-process; returns the violations."""
+        employees = (
+            self.df[["Name", "Band", "Experience", "Domain", "Sub_Domain"]]
+            .fillna("")
+            .itertuples(index=False, name=None)
+        )
+        violations = validate_grid(self.grid, employees, SHIFT_LABELS)
+        print_summary(violations)
+        return violations
+
     def print_data(self) -> None:
-        """Dump the resulting DataFrame to stdout."""
+        """Dump the resulting DataFrame (after materialize_weeks) to stdout."""
         print(self.df.to_string(index=False))
 
     def save_csv(self) -> None:
@@ -489,13 +830,14 @@ class ShiftPlanner:
     def run(self) -> None:
         """Do everything in order, without touching the DB."""
         self.load_employees()
+        self.check_feasibility()
         self.add_weeks()
         self.assign_zero_exp_shift()
         self.assign_exp_shifts()
         # fill any remaining empty slots with "G"
-        for wk in range(1, self.num_weeks + 1):
-            col = f"Week {wk}"
-            self.df.loc[self.df[col] == "", col] = "G"
-            self.check_exp_never_assigned()
+        self.grid[self.grid == EMPTY] = SHIFT_G
+        self.check_exp_never_assigned()
+        self.post_check()
+        self.materialize_weeks()
         self.print_data()
         self.save_csv()
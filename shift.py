@@ -1,45 +1,161 @@
 import sqlite3
 import random
 import csv
-from collections import defaultdict
+import math
+import time
+import heapq
+from collections import defaultdict, namedtuple
+from operator import itemgetter
+from shift_db import reset_assignments, configure_connection, flush_assignments, report_write_rate
+from feasibility import load_headcounts, analyse_shift_rules, report_feasibility, infeasible_summary
+from verify_shifts import validate_assignments, print_summary, ValidatorState, ALTERNATION_RULES, SHIFTS_123
+from what_if import WhatIf
+from fairness import FairnessScoreboard, LoadQueue, CachedStream
+from gap_ring import GapRing
+
+# One week chosen jointly by match_week: Shift 1 row, Shift 2 (AD-SEL, FD-SEL)
+# rows, Shift 3 (Associate, Layam) rows, and the warnings for relaxed alternations
+WeekPlan = namedtuple("WeekPlan", "shift1 shift2 shift3 relaxed")
+
+# Shift 3 relaxation level (2 × Associate relaxed + Layam relaxed) -> what was relaxed
+SHIFT3_RELAXED = {1: "Layam alternation", 2: "Associate alternation", 3: "both alternations"}
+
+
+def iter_bits(mask):
+    # Positions of the set bits in an integer bitset, lowest first
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def add_costs(*costs):
+    # Component-wise sum of match_week's lexicographic cost tuples
+    return tuple(map(sum, zip(*costs)))
+
 
 class ShiftPlanner:
-    def __init__(self, db_path='SEL_Employess_Data.db', weeks=21):
+    def __init__(self, db_path='SEL_Employess_Data.db', weeks=21, wal=False,
+                 search_seconds=1.0, search_iterations=20000, by_class=False, engine='greedy'):
         self.db_path = db_path
         self.weeks = weeks
+        # 'greedy' fills Shift 1, 2 and 3 one after the other; 'matching' picks them together (match_week)
+        if engine not in ('greedy', 'matching'):
+            raise ValueError(f"Unknown engine: {engine!r}")
+        self.engine = engine
+        # Pair up equivalence classes instead of individuals (see class_representatives)
+        self.by_class = by_class
+        # Budget of the local-search pass after the greedy plan (0 turns it off)
+        self.search_seconds = search_seconds
+        self.search_iterations = search_iterations
         self.conn = sqlite3.connect(self.db_path)
+        configure_connection(self.conn, wal=wal)
         self.cursor = self.conn.cursor()
+        self.history = {}
+        self.roster_pos = {}
+        self.last_shift_masks = {'1': 0, '2': 0, '3': 0}
+        # (Band, Domain, Sub_Domain, last shift) -> LoadQueue of its experienced members
+        self.queues = defaultdict(LoadQueue)
+        self.queue_of = {}
+        # Who worked each of the last 5 weeks, for the 5-week gap
+        self.gap_ring = GapRing(5)
+        # Assignments are buffered here and written in one transaction at the end of run()
+        self.pending = []
 
-    def assigned_shift_recently(self, eid, current_week, gap=5, last_assigned_week=None):
-        # Check in-memory assignments first
-        if last_assigned_week and current_week - last_assigned_week[eid] < gap:
-            return True
-        # Then check DB (for previous runs)
-        if current_week <= gap:
-            return False
-        self.cursor.execute("""
-            SELECT week FROM ShiftAssignments
-            WHERE employee_id = ? 
-            AND shift_code IN ('1','2','3') 
-            AND week > ?
-        """, (eid, current_week - gap))
-        return self.cursor.fetchone() is not None
+    def reset_history(self):
+        # run() clears ShiftAssignments and replans weeks 1..weeks, so every plan starts from an empty history
+        self.history = {}
+        self.gap_ring = GapRing(5)
+
+    def record_history(self, eid, shift_code, week, gap=5):
+        entry = self.history.setdefault(eid, {'last_week': None, 'last_shift': None, 'count': 0})
+        self.set_last_shift_bit(eid, entry['last_shift'], shift_code)
+        entry['last_week'] = week
+        entry['last_shift'] = shift_code
+        entry['count'] += 1
+        if eid in self.roster_pos:
+            self.gap_ring.mark(week, 1 << self.roster_pos[eid])
+        # Move the member to the queue of its new last shift, due again after the gap
+        group = self.queue_of.get(eid)
+        if group is not None:
+            self.queues[group].remove(eid)
+            group = group[:3] + (shift_code,)
+            self.queue_of[eid] = group
+            self.queues[group].push(eid, entry['count'], week + gap)
+
+    def build_queues(self):
+        """
+        One least-loaded-first LoadQueue per (Band, Domain, Sub_Domain, last
+        shift). A plan starts with everyone at load 0 and no last shift.
+        Everything the alternation and repeat rules look at is the same for
+        the whole queue, so the pickers below only merge queues and never
+        re-sort the pool.
+        """
+        self.queues = defaultdict(LoadQueue)
+        self.queue_of = {}
+        for eid, _, band, exp, domain, sub_domain in self.roster:
+            if band not in ('Associate', 'Layam') or int(exp) <= 0:
+                continue
+            group = (band, domain, sub_domain, None)
+            self.queue_of[eid] = group
+            self.queues[group].push(eid, 0)
+
+    def ordered(self, week, available, prefix):
+        """
+        (key, row) for the members in the available mask, lowest key first.
+        Members still inside their 5-week gap in week are skipped in the
+        queue walk itself, before the mask is read.
+        prefix maps a queue's (Band, Domain, Sub_Domain, last shift) to the
+        relaxation levels its members share, or to None to leave it out; the
+        key is that prefix plus the member's load. The queues are merged
+        lazily, so reading the next candidate costs O(log n). With by_class,
+        only the first member of each class in each queue is kept.
+        """
+        def tagged(key, group):
+            for entry in self.queues[group].walk(week):
+                yield key, entry, group
+
+        streams = []
+        for group in self.queues:
+            key = prefix(group)
+            if key is not None:
+                streams.append(tagged(key, group))
+        seen = set()
+        for key, (load, _, _, eid), group in heapq.merge(*streams):
+            if not available >> self.roster_pos[eid] & 1:
+                continue
+            row = self.roster[self.roster_pos[eid]]
+            if self.by_class:
+                if (group, row[3]) in seen:
+                    continue
+                seen.add((group, row[3]))
+            yield key + (load,), row
+
+    def set_last_shift_bit(self, eid, old_shift, new_shift):
+        pos = self.roster_pos.get(eid)
+        if pos is None:
+            return
+        if old_shift in self.last_shift_masks:
+            self.last_shift_masks[old_shift] &= ~(1 << pos)
+        if new_shift in self.last_shift_masks:
+            self.last_shift_masks[new_shift] |= 1 << pos
+
+    def assign_shift(self, eid, shift_code, week):
+        self.pending.append((eid, shift_code, week))
+        if shift_code in ('1', '2', '3'):
+            self.record_history(eid, shift_code, week)
+
+    def assigned_shift_recently(self, eid, current_week, gap=5):
+        pos = self.roster_pos.get(eid)
+        return pos is not None and bool(self.gap_ring.blocked(current_week, gap) >> pos & 1)
 
     def get_shift_count(self, eid):
-        self.cursor.execute("""
-            SELECT COUNT(*) FROM ShiftAssignments 
-            WHERE employee_id = ? AND shift_code IN ('1', '2', '3')
-        """, (eid,))
-        return self.cursor.fetchone()[0]
+        entry = self.history.get(eid)
+        return entry['count'] if entry else 0
 
     def get_last_shift(self, eid):
-        self.cursor.execute("""
-            SELECT shift_code FROM ShiftAssignments
-            WHERE employee_id = ? AND shift_code IN ('1', '2', '3')
-            ORDER BY week DESC LIMIT 1
-        """, (eid,))
-        row = self.cursor.fetchone()
-        return row[0] if row else None
+        entry = self.history.get(eid)
+        return entry['last_shift'] if entry else None
 
     def get_employee_experience(self, eid):
         self.cursor.execute("SELECT Experience FROM Employees WHERE id = ?", (eid,))
@@ -66,6 +182,80 @@ class ShiftPlanner:
         self.cursor.execute(sql)
         return self.cursor.fetchall()
 
+    def build_compatibility(self):
+        """
+        Build the static pair-compatibility bitsets once per run. Bit i of a
+        mask is roster position i. compat2[i] holds i's possible Shift 2
+        partners (Layam, opposite domain) and compat3[i] its Shift 3 partners
+        (the other band); both require an experience difference <= 2 (req 11).
+        """
+        self.cursor.execute("""
+            SELECT id, Name, Band, Experience, Domain, Sub_Domain
+            FROM Employees
+        """)
+        self.roster = self.cursor.fetchall()
+        self.roster_pos = {row[0]: i for i, row in enumerate(self.roster)}
+        # Only experienced Associates/Layams ever take shift 1, 2 or 3
+        self.bucket_masks = defaultdict(int)
+        for i, (eid, _, band, exp, domain, sub_domain) in enumerate(self.roster):
+            if band in ('Associate', 'Layam') and int(exp) > 0:
+                self.bucket_masks[(band, domain, sub_domain, int(exp))] |= 1 << i
+        self.shift_pool = self.mask_where(lambda key: True)
+        self.compat2 = [0] * len(self.roster)
+        self.compat3 = [0] * len(self.roster)
+        for key, members in self.bucket_masks.items():
+            partners2 = self.mask_where(
+                lambda other: key[0] == other[0] == 'Layam'
+                and {key[1], other[1]} == {'AD-SEL', 'FD-SEL'}
+                and abs(key[3] - other[3]) <= 2
+            )
+            partners3 = self.mask_where(
+                lambda other: {key[0], other[0]} == {'Associate', 'Layam'}
+                and abs(key[3] - other[3]) <= 2
+            )
+            for i in iter_bits(members):
+                self.compat2[i] = partners2
+                self.compat3[i] = partners3
+        self.last_shift_masks = {'1': 0, '2': 0, '3': 0}
+
+    def mask_where(self, predicate):
+        # Union of the bucket masks whose (Band, Domain, Sub_Domain, Experience) key matches
+        mask = 0
+        for key, members in self.bucket_masks.items():
+            if predicate(key):
+                mask |= members
+        return mask
+
+    def available_mask(self, week):
+        # Experienced employees outside their gap window and not yet on a shift 1/2/3 this week
+        return self.shift_pool & ~self.gap_ring.blocked(week)
+
+    def class_representatives(self, mask, board, per_class=1):
+        """
+        Up to per_class members of mask per equivalence class (bucket_masks
+        key): the least-loaded ones, longest-waiting first, so classmates take
+        turns. Classmates are interchangeable for every rule and the pair sort
+        keys prefer the lower load, so pairing representatives loses no option.
+        """
+        reps = 0
+        for key, members in self.bucket_masks.items():
+            if not members & mask:
+                continue
+            taken = 0
+            for eid in board.by_load(key):
+                if mask >> self.roster_pos[eid] & 1:
+                    reps |= 1 << self.roster_pos[eid]
+                    taken += 1
+                    if taken == per_class:
+                        break
+        return reps
+
+    def bitset_pairs(self, left, right, compat):
+        # Yield roster row pairs (l, r) with l in left, r in right and r compatible with l
+        for i in iter_bits(left):
+            for j in iter_bits(compat[i] & right):
+                yield self.roster[i], self.roster[j]
+
     def get_balanced_candidate(self, candidates, week, last_domain=None, last_subdomain=None, shift_code=None, domain_alternate=None, subdomain_alternate=None):
         # Filter by alternation
         filtered = []
@@ -141,18 +331,277 @@ class ShiftPlanner:
                 return (a, l)
         return None
 
+    def match_week(self, week, board, last_domain1, last_subdomain1,
+                   last_fd_subdomain2, last_domain3, last_subdomain3):
+        """
+        Fill the week's five slots together instead of shift by shift, so a
+        cheap Shift 2 pair cannot take the only Layams a Shift 3 pair needed.
+        A week costs, compared in this order:
+
+          broken   alternations verify_shifts will report
+          relaxed  slots with a broken alternation or a repeated last shift,
+                   the greedy passes' relaxation level (one warning each)
+          assoc    Shift 3 Associate alternation relaxed (the greedy level 2)
+          starved  the Shift 3 Layam leaves next week's Shift 2 Layam group
+                   (AD-SEL, or the other FD-SEL sub-domain) with nobody free
+          short    Layams the Shift 3 Layam's group lacks for Shift 2 over
+                   the 5 weeks the gap keeps them off
+          fresh    the Shift 3 Layam was not on Shift 2 last time, so a
+                   Layam who can take Shift 2 without repeating is used up
+          load     squared loads
+
+        The middle three look past this week: a per-week optimum that spends
+        the Layams later Shift 2 pairs need only moves the relaxations on.
+        As in the greedy fallbacks, Shift 1 and 2 may repeat someone's last
+        shift; the 5-week gap, the Shift 3 repeat and the experience pairs
+        stay hard. Returns the cheapest WeekPlan, or None when the slots
+        cannot all be filled (the greedy passes take over).
+
+        At most two people of one class work a week: an Associate class gives
+        Shift 1 and the Shift 3 Associate, a Layam class one Shift 2 Layam (the
+        pair spans both domains) and the Shift 3 Layam. Classmates differ
+        only in load and in their last shift, so each slot takes the two
+        least-loaded of each class among those whose last shift it prefers,
+        plus the two least-loaded overall. Any other classmate costs at least
+        as much as one of those that stays free, so the cut loses no optimum.
+        The search walks Shift 2 and Shift 3 pairs in cost order and stops
+        once no cheaper total is possible.
+        """
+        available = self.available_mask(week)
+        next_free = self.shift_pool & ~self.gap_ring.blocked(week + 1)
+        layam_groups = defaultdict(int)
+        for key, members in self.bucket_masks.items():
+            if key[0] == 'Layam':
+                layam_groups[key[1:3]] |= members
+
+        def load(row):
+            return (board.count(row[0]) + 1) ** 2
+
+        def repeated(row, code):
+            return self.last_shift_masks[code] >> self.roster_pos[row[0]] & 1
+
+        def cost1(row):
+            _, _, _, _, domain, sub_domain = row
+            broken = int(bool(last_domain1 and domain == last_domain1) or bool(
+                domain == 'FD-SEL' and last_subdomain1 and sub_domain == last_subdomain1))
+            return (broken, broken | repeated(row, '1'), 0, 0, 0, 0, load(row))
+
+        def cost2(l1, l2):
+            broken = int(bool(last_fd_subdomain2 and l2[5] == last_fd_subdomain2))
+            relaxed = broken | repeated(l1, '2') | repeated(l2, '2')
+            return (broken, relaxed, 0, 0, 0, 0, load(l1) + load(l2))
+
+        def broken3(row):
+            _, _, band, _, domain, sub_domain = row
+            return int(bool(last_domain3[band] and domain == last_domain3[band]) or bool(
+                domain == 'FD-SEL' and last_subdomain3[band] and sub_domain == last_subdomain3[band]))
+
+        def cost3(a, l):
+            broken = broken3(a) + broken3(l)
+            return (broken, int(broken > 0), broken3(a), 0, 0, 1 - repeated(l, '2'), load(a) + load(l))
+
+        def lookahead(l, l1, l2):
+            # Shift 2 takes an AD-SEL Layam every week and each FD-SEL sub-domain
+            # every other week, starting with the one l2 does not cover
+            group = layam_groups[tuple(l[4:6])]
+            taken = sum(1 << self.roster_pos[row[0]] for row in (l, l1, l2))
+            if l[4] == 'AD-SEL':
+                need, starved = 5, not group & next_free & ~taken
+            elif l[5] != l2[5]:
+                need, starved = 3, not group & next_free & ~taken
+            else:
+                need, starved = 2, False
+            short = max(0, need - bin(group & ~taken).count('1'))
+            return (0, 0, 0, int(starved), short, 0, 0)
+
+        def representatives(mask, code):
+            strict = self.class_representatives(mask & ~self.last_shift_masks[code], board, 2)
+            return strict | self.class_representatives(mask, board, 2)
+
+        def ranked(options):
+            # Cheapest first; shuffled before the stable sort so equal costs tie at random
+            random.shuffle(options)
+            options.sort(key=itemgetter(0))
+            return options
+
+        associates = self.mask_where(lambda key: key[0] == 'Associate')
+        eligible = representatives(available & associates, '1')
+        shift1 = ranked([
+            (cost1(a), a)
+            for a in (self.roster[i] for i in iter_bits(eligible))
+        ])
+
+        eligible = representatives(available, '2')
+        layam_ad = self.mask_where(lambda key: key[0] == 'Layam' and key[1] == 'AD-SEL')
+        layam_fd = self.mask_where(lambda key: key[0] == 'Layam' and key[1] == 'FD-SEL')
+        shift2 = ranked([
+            (cost2(l1, l2), l1, l2)
+            for l1, l2 in self.bitset_pairs(eligible & layam_ad, eligible & layam_fd, self.compat2)
+        ])
+
+        # Shift 3 prefers Layams whose last shift was 2
+        free3 = available & ~self.last_shift_masks['3']
+        eligible = (self.class_representatives(free3 & self.last_shift_masks['2'], board, 2)
+                    | self.class_representatives(free3, board, 2))
+        layams = self.mask_where(lambda key: key[0] == 'Layam')
+        shift3 = ranked([
+            (cost3(a, l), a, l)
+            for a, l in self.bitset_pairs(eligible & associates, eligible & layams, self.compat3)
+        ])
+        if not shift1 or not shift2 or not shift3:
+            return None
+
+        best = None
+        for pair2, l1, l2 in shift2:
+            if best and add_costs(pair2, shift3[0][0], shift1[0][0]) >= best[0]:
+                break
+            for pair3, a, l in shift3:
+                if best and add_costs(pair2, pair3, shift1[0][0]) >= best[0]:
+                    break
+                if l in (l1, l2):
+                    continue
+                # Shift 1 only clashes with the Shift 3 Associate
+                single = next(((slot1, s) for slot1, s in shift1[:2] if s != a), None)
+                if single is None:
+                    continue
+                total = add_costs(pair2, pair3, single[0], lookahead(l, l1, l2))
+                if best is None or total < best[0]:
+                    best = (total, single[1], (l1, l2), (a, l))
+        if best is None:
+            return None
+
+        _, s1, (l1, l2), (a, l) = best
+        relaxed = []
+        if cost1(s1)[1]:
+            relaxed.append(f"WARNING: Relaxed alternation for Shift 1 in week {week}")
+        if cost2(l1, l2)[1]:
+            relaxed.append(f"WARNING: Relaxed alternation for Shift 2 in week {week}")
+        level3 = 2 * broken3(a) + broken3(l)
+        if level3:
+            relaxed.append(f"WARNING: Relaxed {SHIFT3_RELAXED[level3]} for Shift 3 in week {week}")
+        return WeekPlan(s1, (l1, l2), (a, l), relaxed)
+
+    def improve_plan(self):
+        """
+        Simulated annealing over legal replacements after the greedy plan
+        (req 12). A move hands one of a busiest member's shifts to a lighter
+        member of the same band and experience, in the same week. Moves that
+        add a hard-rule violation or a Shift 3 repeat (never relaxed by the
+        greedy passes) are undone at once. The kept plan never has a wider
+        fairness spread, more relaxed alternations or more Shift 1/2 repeats
+        than the greedy one.
+        """
+        state = ValidatorState.from_assignments(self.pending, self.roster, self.weeks)
+        what_if = WhatIf(state)
+        # Shift totals per (band, experience), the groups the moves stay in
+        board = FairnessScoreboard()
+        groups = defaultdict(list)
+        for eid, _, band, exp, _, _ in self.roster:
+            if band in ('Associate', 'Layam') and int(exp) > 0:
+                groups[(band, int(exp))].append(eid)
+                board.add_member(eid, (band, int(exp)), count=len(state.shift_weeks[eid]))
+        groups = [members for members in groups.values() if len(members) > 1]
+        if not groups or self.search_seconds <= 0:
+            return
+
+        def spread():
+            # Sum over (band, experience) groups of max - min shift totals
+            return sum(board.spread(group) for group in board.groups())
+
+        def relaxed(violations):
+            return sum(1 for v in violations if v.rule in ALTERNATION_RULES)
+
+        def is_hard(v):
+            return v.rule not in ALTERNATION_RULES and v.condition != 13
+
+        def repeats(*eids):
+            # (Shift 1/2, Shift 3) taken twice in a row by the same person
+            soft = hard = 0
+            for eid in eids:
+                codes = [state.cells[eid][i] for i in state.shift_weeks[eid]]
+                for prev, code in zip(codes, codes[1:]):
+                    if prev == code:
+                        hard += code == '3'
+                        soft += code != '3'
+            return soft, hard
+
+        relax_weight = 3
+        relax0, repeat0, spread0 = relaxed(state.violations()), repeats(*board.counts)[0], spread()
+        relax, repeat, spread_now = relax0, repeat0, spread0
+        best_score, best_cells = (relax0 + repeat0) * relax_weight + spread0, None
+        tried = accepted = 0
+        start = time.perf_counter()
+        while tried < self.search_iterations:
+            elapsed = time.perf_counter() - start
+            if elapsed >= self.search_seconds:
+                break
+            temperature = max(0.05, 0.5 * (1 - elapsed / self.search_seconds))
+
+            members = random.choice(groups)
+            totals = {eid: len(state.shift_weeks[eid]) for eid in members}
+            busiest, lightest = max(totals.values()), min(totals.values())
+            if busiest == lightest:
+                continue
+            giver = random.choice([eid for eid in members if totals[eid] == busiest])
+            taker = random.choice([eid for eid in members if totals[eid] < busiest])
+            week = state.week_numbers[random.choice(state.shift_weeks[giver])]
+            if what_if.code(taker, week) in SHIFTS_123 or not what_if.clear_of_gap(taker, week):
+                continue
+            tried += 1
+
+            soft_before, hard_before = repeats(giver, taker)
+            delta, undo = what_if.apply_edits(what_if.replace_edits(giver, taker, week))
+            soft_after, hard_after = repeats(giver, taker)
+            if hard_after > hard_before or any(is_hard(v) for v in delta.added):
+                what_if.apply_edits(undo)
+                continue
+            board.record(giver, -1)
+            board.record(taker)
+            new_relax = relax + relaxed(delta.added) - relaxed(delta.removed)
+            new_repeat = repeat + soft_after - soft_before
+            new_spread = spread()
+            # Evening out totals inside the group (sum of squares) breaks ties between equal spreads
+            evening = 2 * (totals[taker] - totals[giver] + 1) * 0.1
+            change = (new_relax + new_repeat - relax - repeat) * relax_weight + (new_spread - spread_now) + evening
+            if change > 0 and random.random() >= math.exp(-change / temperature):
+                what_if.apply_edits(undo)
+                board.record(taker, -1)
+                board.record(giver)
+                continue
+            accepted += 1
+            relax, repeat, spread_now = new_relax, new_repeat, new_spread
+            score = (relax + repeat) * relax_weight + spread_now
+            if score < best_score and relax <= relax0 and repeat <= repeat0 and spread_now <= spread0:
+                best_score = score
+                best_cells = {eid: dict(cells) for eid, cells in state.cells.items()}
+                best_relax, best_repeat, best_spread = relax, repeat, spread_now
+
+        if best_cells is None:
+            print(f"Local search: no improvement on spread {spread0}, relaxed alternations {relax0}, "
+                  f"repeated shifts {repeat0} ({accepted} of {tried} moves accepted)")
+            return
+        self.pending = [
+            (eid, best_cells[eid][i], state.week_numbers[i])
+            for i in range(len(state.weeks))
+            for eid, *_ in self.roster
+            if i in best_cells[eid]
+        ]
+        print(f"Local search: fairness spread {spread0} -> {best_spread}, "
+              f"relaxed alternations {relax0} -> {best_relax}, repeated shifts {repeat0} -> {best_repeat} "
+              f"({accepted} of {tried} moves accepted in {time.perf_counter() - start:.2f}s)")
+
     def run(self):
-        self.cursor.execute("DROP TABLE IF EXISTS ShiftAssignments")
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS ShiftAssignments (
-                assignment_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                employee_id INTEGER,
-                shift_code TEXT,
-                week INTEGER,
-                FOREIGN KEY (employee_id) REFERENCES Employees(id)
-            )
-        """)
-        self.cursor.execute("DELETE FROM ShiftAssignments")
+        # Fail fast when the 5-week gap or the experience pairs cannot be met
+        failed = report_feasibility(analyse_shift_rules(load_headcounts(self.cursor), self.weeks), self.weeks)
+        if failed:
+            self.conn.close()
+            raise RuntimeError(infeasible_summary(failed, self.weeks))
+
+        reset_assignments(self.conn)
+        self.build_compatibility()
+        self.reset_history()
+        self.build_queues()
+        self.pending = []
 
         last_domain_shift1 = None
         last_subdomain_shift1 = None
@@ -160,232 +609,198 @@ class ShiftPlanner:
         last_domain_shift3 = {'Associate': None, 'Layam': None}
         last_subdomain_shift3 = {'Associate': None, 'Layam': None}
 
-        # Track shift counts by experience for balancing (req 13)
-        shift_counts_by_exp = defaultdict(lambda: defaultdict(int))
-        last_assigned_week = defaultdict(lambda: -100)
-        
-        # from collections import deque
-
-        # # Build round-robin queues for each group (band, experience)
-        # group_queues = defaultdict(deque)
-        # for eid, name, band, exp, domain, sub_domain in self.get_employees():
-        #     if band in ('Associate', 'Layam') and int(exp) > 0:
-        #         group_queues[(band, int(exp))].append(eid)
-        
+        # Shift counts by experience (req 13) and by equivalence class for balancing
+        board = FairnessScoreboard()
+        for eid, _, band, exp, domain, sub_domain in self.roster:
+            if band in ('Associate', 'Layam') and int(exp) > 0:
+                board.add_member(eid, int(exp), (band, domain, sub_domain, int(exp)))
+        if self.by_class:
+            print(f"Planning over {len(self.bucket_masks)} equivalence classes "
+                  f"for {bin(self.shift_pool).count('1')} experienced employees")
+
+        exp0_emps = self.get_employees(exp=0)
+
         for week in range(1, self.weeks + 1):
             assigned_ids = set()
 
             # 1. Experience 0 → Shift G (req 1, 7)
-            exp0_emps = self.get_employees(exp=0)
             for eid, *_ in exp0_emps:
-                self.cursor.execute(
-                    "INSERT INTO ShiftAssignments (employee_id, shift_code, week) VALUES (?, ?, ?)",
-                    (eid, 'G', week)
-                )
+                self.assign_shift(eid, 'G', week)
                 assigned_ids.add(eid)
 
+            plan = None
+            if self.engine == 'matching':
+                plan = self.match_week(
+                    week, board, last_domain_shift1, last_subdomain_shift1,
+                    last_fd_subdomain_shift2, last_domain_shift3, last_subdomain_shift3
+                )
+                if plan:
+                    for warning in plan.relaxed:
+                        print(warning)
+                else:
+                    print(f"WARNING: No joint assignment for week {week}, filling shifts one by one")
+
             # Shift 1: 1 Associate, alternate domain/subdomain (req 2, 3, 4, 10, 13)
-            associates = self.get_employees(exclude_ids=assigned_ids, band='Associate')
-            associates = [a for a in associates if int(a[3]) > 0]
-            associates.sort(key=lambda a: (shift_counts_by_exp[int(a[3])][a[0]], self.get_shift_count(a[0])))
-            candidates = []
-            for a in associates:
-                eid, _, _, _, domain, sub_domain = a
-                if self.assigned_shift_recently(eid, week, gap=5, last_assigned_week=last_assigned_week):
-                    continue
-                if last_domain_shift1 and domain == last_domain_shift1:
-                    continue
-                if domain == 'FD-SEL' and last_subdomain_shift1 and sub_domain == last_subdomain_shift1:
-                    continue
-                # Do not assign same shift type as last week
-                if self.get_last_shift(eid) == '1':
-                    continue
-                candidates.append(a)
-            # Sort by fewest total shifts, then random
-            random.shuffle(candidates)
-            candidates.sort(key=lambda a: (shift_counts_by_exp[int(a[3])][a[0]], self.get_shift_count(a[0])))
-            chosen = candidates[0] if candidates else None
-            if not chosen:
-                # fallback: relax alternation but NEVER relax 5-week gap
-                for a in associates:
-                    eid = a[0]
-                    if eid in assigned_ids:
-                        continue
-                    if self.assigned_shift_recently(eid, week, gap=5, last_assigned_week=last_assigned_week):
-                        continue
-                    chosen = a
+            if plan:
+                chosen = plan.shift1
+            else:
+                # Strict candidates first (level 0), then the fallback that relaxes
+                # alternation and last week's shift (level 1); never the 5-week gap.
+                # Then fewest shifts, then random
+                def level1(group):
+                    band, domain, sub_domain, last_shift = group
+                    if band != 'Associate':
+                        return None
+                    return (int(
+                        bool(last_domain_shift1 and domain == last_domain_shift1)
+                        or bool(domain == 'FD-SEL' and last_subdomain_shift1 and sub_domain == last_subdomain_shift1)
+                        or last_shift == '1'
+                    ),)
+
+                best = next(self.ordered(week, self.available_mask(week), level1), None)
+                chosen = best[1] if best else None
+                if best and best[0][0]:
                     print(f"WARNING: Relaxed alternation for Shift 1 in week {week}")
-                    break
             if chosen:
                 eid, _, _, exp, domain, sub_domain = chosen
-                self.cursor.execute(
-                    "INSERT INTO ShiftAssignments (employee_id, shift_code, week) VALUES (?, ?, ?)",
-                    (eid, '1', week)
-                )
+                self.assign_shift(eid, '1', week)
                 assigned_ids.add(eid)
                 last_domain_shift1 = domain
                 last_subdomain_shift1 = sub_domain
-                shift_counts_by_exp[int(exp)][eid] += 1
-                last_assigned_week[eid] = week
-                
+                board.record(eid)
+
             else:
                 print(f"WARNING: No valid candidate for Shift 1 in week {week} (5-week gap strictly enforced)")
 
             # Shift 2: 2 Layam, 1 AD-SEL, 1 FD-SEL, alternate FD-SEL subdomain (req 2, 3, 5, 10, 11, 12, 13)
-            layams = self.get_employees(exclude_ids=assigned_ids, band='Layam')
-            layams = [l for l in layams if int(l[3]) > 0]
-            pairs = []
-            for i, l1 in enumerate(layams):
-                for l2 in layams[i+1:]:
-                    if l1[0] == l2[0]:
-                        continue
-                    domains = {l1[4], l2[4]}
-                    if domains != {'AD-SEL', 'FD-SEL'}:
-                        continue
-                    fd = l1 if l1[4] == 'FD-SEL' else l2
-                    if last_fd_subdomain_shift2 and fd[5] == last_fd_subdomain_shift2:
-                        continue
-                    if self.assigned_shift_recently(l1[0], week, gap=5, last_assigned_week=last_assigned_week) or self.assigned_shift_recently(l2[0], week, gap=5, last_assigned_week=last_assigned_week):
-                        continue
-                    if abs(int(l1[3]) - int(l2[3])) > 2:
-                        continue
-                    exps = sorted([int(l1[3]), int(l2[3])])
-                    if not (exps == [1,3] or exps == [2,2] or exps[1]-exps[0]<=2):
-                        continue
-                    if self.get_last_shift(l1[0]) == '2' or self.get_last_shift(l2[0]) == '2':
+            # Dynamic eligibility: experienced, not yet placed this week, outside the 5-week gap
+            if plan:
+                chosen_pair = plan.shift2
+            else:
+                def repeat(group):
+                    return int(group[3] == '2')
+
+                def same_subdomain(group):
+                    return int(bool(last_fd_subdomain_shift2 and group[2] == last_fd_subdomain_shift2))
+
+                def layams_in(domain, levels):
+                    return lambda group: levels(group) if group[:2] == ('Layam', domain) else None
+
+                # Pair key: (relaxation level, FD-SEL sub-domain repeated, bal_max, bal_sum).
+                # Level 0 is strict; level 1 is the fallback that relaxes the sub-domain or
+                # last week's shift. Each FD-SEL Layam's best partner is the first compatible
+                # AD-SEL in the matching order, so one walk down the FD-SEL queue finds the
+                # best pair and stops once no later one can beat it.
+                available = self.available_mask(week)
+                ad_strict = CachedStream(self.ordered(week, available, layams_in('AD-SEL', lambda g: (repeat(g),))))
+                ad_by_load = CachedStream(self.ordered(week, available, layams_in('AD-SEL', lambda g: ())))
+                fd_rows = self.ordered(week, available, layams_in(
+                    'FD-SEL', lambda g: (same_subdomain(g) | repeat(g), same_subdomain(g))
+                ))
+                best = None
+                for (level2, same2, count2), l2 in fd_rows:
+                    if best and (level2, same2, count2, count2) >= best[0]:
+                        break
+                    partners = self.compat2[self.roster_pos[l2[0]]]
+                    l1 = next(((key1, l) for key1, l in (ad_by_load if level2 else ad_strict)
+                               if partners >> self.roster_pos[l[0]] & 1), None)
+                    if l1 is None:
                         continue
-                    bal_max = max(shift_counts_by_exp[int(l1[3])][l1[0]], shift_counts_by_exp[int(l2[3])][l2[0]])
-                    bal_sum = shift_counts_by_exp[int(l1[3])][l1[0]] + shift_counts_by_exp[int(l2[3])][l2[0]]
-                    pairs.append((bal_max, bal_sum, l1, l2))
-            pairs.sort(key=lambda x: (x[0], x[1]))
-            chosen_pair = pairs[0][2:] if pairs else None
-            if not chosen_pair:
-                # fallback: relax alternation but NEVER relax 5-week gap
-                fallback_pairs = []
-                for i, l1 in enumerate(layams):
-                    for l2 in layams[i+1:]:
-                        if l1[0] == l2[0]:
-                            continue
-                        domains = {l1[4], l2[4]}
-                        if domains != {'AD-SEL', 'FD-SEL'}:
-                            continue
-                        # STRICT: still enforce 5-week gap!
-                        if self.assigned_shift_recently(l1[0], week, gap=5, last_assigned_week=last_assigned_week) or self.assigned_shift_recently(l2[0], week, gap=5, last_assigned_week=last_assigned_week):
-                            continue
-                        if abs(int(l1[3]) - int(l2[3])) > 2:
-                            continue
-                        exps = sorted([int(l1[3]), int(l2[3])])
-                        if not (exps == [1,3] or exps == [2,2] or exps[1]-exps[0]<=2):
-                            continue
-                        fd = l1 if l1[4] == 'FD-SEL' else l2
-                        subdomain_penalty = 0 if not last_fd_subdomain_shift2 or fd[5] != last_fd_subdomain_shift2 else 1
-                        bal = max(shift_counts_by_exp[exps[0]][l1[0]], shift_counts_by_exp[exps[1]][l2[0]])
-                        fallback_pairs.append((subdomain_penalty, bal, l1, l2))
-                fallback_pairs.sort(key=lambda x: (x[0], x[1]))
-                chosen_pair = fallback_pairs[0][2:] if fallback_pairs else None
-                if chosen_pair:
+                    key1, l1 = l1
+                    count1 = key1[-1]
+                    repeat1 = self.last_shift_masks['2'] >> self.roster_pos[l1[0]] & 1
+                    key = (level2 | repeat1, same2, max(count1, count2), count1 + count2)
+                    if best is None or key < best[0]:
+                        best = (key, (l1, l2))
+                chosen_pair = best[1] if best else None
+                if best and best[0][0]:
                     print(f"WARNING: Relaxed alternation for Shift 2 in week {week}")
             if chosen_pair:
                 for l in chosen_pair:
                     eid, _, _, exp, domain, sub_domain = l
-                    self.cursor.execute(
-                        "INSERT INTO ShiftAssignments (employee_id, shift_code, week) VALUES (?, ?, ?)",
-                        (eid, '2', week)
-                    )
+                    self.assign_shift(eid, '2', week)
                     assigned_ids.add(eid)
-                    shift_counts_by_exp[int(exp)][eid] += 1
-                    last_assigned_week[eid] = week
+                    board.record(eid)
                     if domain == 'FD-SEL':
                         last_fd_subdomain_shift2 = sub_domain
             else:
                 print(f"WARNING: No valid pair for Shift 2 in week {week} (5-week gap strictly enforced)")
                 
             # Shift 3: 1 Associate + 1 Layam, alternate domain/subdomain for both (req 2, 3, 6, 10, 11, 12, 13)
-            candidates = self.get_employees(exclude_ids=assigned_ids)
-            associates = [c for c in candidates if c[2] == 'Associate' and int(c[3]) > 0]
-            layams = [c for c in candidates if c[2] == 'Layam' and int(c[3]) > 0]
-
-            def valid_pairs(associates, layams, enforce_assoc_alt=True, enforce_layam_alt=True, enforce_gap=True):
-                pairs = []
-                for a in associates:
-                    for l in layams:
-                        # Alternation for Associate
-                        if enforce_assoc_alt and last_domain_shift3['Associate'] and a[4] == last_domain_shift3['Associate']:
-                            continue
-                        if enforce_assoc_alt and a[4] == 'FD-SEL' and last_subdomain_shift3['Associate'] and a[5] == last_subdomain_shift3['Associate']:
-                            continue
-                        # Alternation for Layam
-                        if enforce_layam_alt and last_domain_shift3['Layam'] and l[4] == last_domain_shift3['Layam']:
-                            continue
-                        if enforce_layam_alt and l[4] == 'FD-SEL' and last_subdomain_shift3['Layam'] and l[5] == last_subdomain_shift3['Layam']:
-                            continue
-                        # 5 week gap
-                        if enforce_gap and (self.assigned_shift_recently(a[0], week, gap=5, last_assigned_week=last_assigned_week) or self.assigned_shift_recently(l[0], week, gap=5, last_assigned_week=last_assigned_week)):
-                            continue
-                        # Experience difference ≤ 2
-                        if abs(int(a[3]) - int(l[3])) > 2:
-                            continue
-                        # Experience pairs mostly (3,1) or (2,2)
-                        exps = sorted([int(a[3]), int(l[3])])
-                        if not (exps == [1,3] or exps == [2,2] or exps[1]-exps[0]<=2):
-                            continue
-                        if self.get_last_shift(a[0]) == '3' or self.get_last_shift(l[0]) == '3':
-                            continue
-                        # Prefer Layam FD-SEL subdomain alternation if possible
-                        layam_fd_penalty = 0
-                        if l[4] == 'FD-SEL' and last_subdomain_shift3['Layam'] and l[5] == last_subdomain_shift3['Layam']:
-                            layam_fd_penalty = 1
-                        bal_max = max(shift_counts_by_exp[int(a[3])][a[0]], shift_counts_by_exp[int(l[3])][l[0]])
-                        bal_sum = shift_counts_by_exp[int(a[3])][a[0]] + shift_counts_by_exp[int(l[3])][l[0]]
-                        pairs.append((layam_fd_penalty, bal_max, bal_sum, a, l))
-                random.shuffle(pairs)
-                pairs.sort(key=lambda x: (x[0], x[1], x[2]))
-                return pairs
-
-            # Try strict alternation for both
-            pairs = valid_pairs(associates, layams, enforce_assoc_alt=True, enforce_layam_alt=True, enforce_gap=True)
-            if not pairs:
-                # Relax Layam alternation only
-                pairs = valid_pairs(associates, layams, enforce_assoc_alt=True, enforce_layam_alt=False, enforce_gap=True)
-                if pairs:
-                    print(f"WARNING: Relaxed Layam alternation for Shift 3 in week {week}")
-            if not pairs:
-                # Relax Associate alternation only
-                pairs = valid_pairs(associates, layams, enforce_assoc_alt=False, enforce_layam_alt=True, enforce_gap=True)
-                if pairs:
-                    print(f"WARNING: Relaxed Associate alternation for Shift 3 in week {week}")
-            if not pairs:
-                # Relax both alternations (last resort)
-                pairs = valid_pairs(associates, layams, enforce_assoc_alt=False, enforce_layam_alt=False, enforce_gap=True)
-                if pairs:
-                    print(f"WARNING: Relaxed both alternations for Shift 3 in week {week}")
-
-            chosen_pair = pairs[0][3:] if pairs else None
+            if plan:
+                chosen_pair = plan.shift3
+            else:
+                def breaks(group):
+                    # Domain/subdomain does not alternate from the band's last Shift 3
+                    band, domain, sub_domain, _ = group
+                    last_domain = last_domain_shift3[band]
+                    last_subdomain = last_subdomain_shift3[band]
+                    return int(bool(last_domain and domain == last_domain)
+                               or bool(domain == 'FD-SEL' and last_subdomain and sub_domain == last_subdomain))
+
+                def fd_penalty(group):
+                    # Prefer Layam FD-SEL subdomain alternation if possible
+                    return int(bool(group[1] == 'FD-SEL' and last_subdomain_shift3['Layam']
+                                    and group[2] == last_subdomain_shift3['Layam']))
+
+                def associates(group):
+                    if group[0] != 'Associate' or group[3] == '3':
+                        return None
+                    return (breaks(group),)
+
+                def layams(group):
+                    if group[0] != 'Layam' or group[3] == '3':
+                        return None
+                    return (breaks(group), fd_penalty(group))
+
+                # Pair key: (relaxation level, fd_penalty, bal_max, bal_sum). The level is
+                # 0 strict, 1 Layam alternation relaxed, 2 Associate relaxed, 3 both (the
+                # order of the old passes). Each Associate's best partner is the first
+                # compatible Layam in queue order, so one walk down the Associate queues
+                # finds the best pair; the queues' random tiebreak settles equal keys.
+                available = self.available_mask(week)
+                layam_rows = CachedStream(self.ordered(week, available, layams))
+                best = None
+                for (break_a, count_a), a in self.ordered(week, available, associates):
+                    if best and (2 * break_a, 0, count_a, count_a) >= best[0]:
+                        break
+                    partners = self.compat3[self.roster_pos[a[0]]]
+                    l = next(((key_l, l) for key_l, l in layam_rows if partners >> self.roster_pos[l[0]] & 1), None)
+                    if l is None:
+                        continue
+                    (break_l, fd_pen, count_l), l = l
+                    key = (2 * break_a + break_l, fd_pen, max(count_a, count_l), count_a + count_l)
+                    if best is None or key < best[0]:
+                        best = (key, (a, l))
+                chosen_pair = best[1] if best else None
+                if best and best[0][0]:
+                    print(f"WARNING: Relaxed {SHIFT3_RELAXED[best[0][0]]} for Shift 3 in week {week}")
+
             if chosen_pair:
                 for c in chosen_pair:
                     eid, _, band, exp, domain, sub_domain = c
-                    self.cursor.execute(
-                        "INSERT INTO ShiftAssignments (employee_id, shift_code, week) VALUES (?, ?, ?)",
-                        (eid, '3', week)
-                    )
+                    self.assign_shift(eid, '3', week)
                     assigned_ids.add(eid)
-                    shift_counts_by_exp[int(exp)][eid] += 1
-                    last_assigned_week[eid] = week
+                    board.record(eid)
                     last_domain_shift3[band] = domain
                     last_subdomain_shift3[band] = sub_domain
             else:
                 print(f"WARNING: No valid pair for Shift 3 in week {week} (5-week gap strictly enforced)")
 
             # 5. Rest → Shift G (req 2, 9)
-            remaining = self.get_employees(exclude_ids=assigned_ids)
+            remaining = [row for row in self.roster if row[0] not in assigned_ids]
             for eid, *_ in remaining:
-                self.cursor.execute(
-                    "INSERT INTO ShiftAssignments (employee_id, shift_code, week) VALUES (?, ?, ?)",
-                    (eid, 'G', week)
-                )
+                self.assign_shift(eid, 'G', week)
                 assigned_ids.add(eid)
 
-        self.conn.commit()
+        self.improve_plan()
+
+        # Check the plan against verify_shifts' rules before it is written
+        print_summary(validate_assignments(self.pending, self.roster, self.weeks))
+
+        write_seconds = flush_assignments(self.conn, self.pending)
+        report_write_rate(len(self.pending), write_seconds)
+        self.pending = []
 
         # Output results (req 8)
         print("\nFinal Shift Planner Result (Pivoted 21 Weeks):\n")
@@ -419,6 +834,7 @@ class ShiftPlanner:
             writer.writerow(header)
             writer.writerows(rows_for_csv)
         print("\nFinal result saved to 'shift_planner_result.csv'\n")
+        self.cursor.execute("PRAGMA optimize")
         self.conn.close()
 
 
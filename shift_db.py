@@ -0,0 +1,193 @@
+import sqlite3
+import sys
+import time
+
+
+def create_assignments_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS ShiftAssignments (
+            assignment_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            employee_id INTEGER,
+            shift_code TEXT,
+            week INTEGER,
+            FOREIGN KEY (employee_id) REFERENCES Employees(id)
+        )
+    """)
+
+
+def create_shift_stats(cursor):
+    """
+    Create EmployeeShiftStats and the triggers that keep it in step with
+    ShiftAssignments. Must be called after ShiftAssignments exists, and again
+    whenever that table is dropped (dropping it also drops its triggers).
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS EmployeeShiftStats (
+            employee_id INTEGER PRIMARY KEY,
+            total_123 INTEGER NOT NULL DEFAULT 0,
+            last_week INTEGER,
+            last_shift TEXT,
+            FOREIGN KEY (employee_id) REFERENCES Employees(id)
+        )
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_shift_stats_insert
+        AFTER INSERT ON ShiftAssignments
+        WHEN NEW.shift_code IN ('1','2','3')
+        BEGIN
+            INSERT INTO EmployeeShiftStats (employee_id, total_123, last_week, last_shift)
+            VALUES (NEW.employee_id, 1, NEW.week, NEW.shift_code)
+            ON CONFLICT(employee_id) DO UPDATE SET
+                total_123 = total_123 + 1,
+                last_shift = CASE WHEN last_week IS NULL OR excluded.last_week >= last_week
+                                  THEN excluded.last_shift ELSE last_shift END,
+                last_week = MAX(COALESCE(last_week, excluded.last_week), excluded.last_week);
+        END
+    """)
+    # A delete can remove the latest row, so rebuild that employee's stats
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_shift_stats_delete
+        AFTER DELETE ON ShiftAssignments
+        WHEN OLD.shift_code IN ('1','2','3')
+        BEGIN
+            DELETE FROM EmployeeShiftStats WHERE employee_id = OLD.employee_id;
+            INSERT INTO EmployeeShiftStats (employee_id, total_123, last_week, last_shift)
+            SELECT employee_id, COUNT(*), MAX(week),
+                   (SELECT shift_code FROM ShiftAssignments
+                    WHERE employee_id = OLD.employee_id AND shift_code IN ('1','2','3')
+                    ORDER BY week DESC LIMIT 1)
+            FROM ShiftAssignments
+            WHERE employee_id = OLD.employee_id AND shift_code IN ('1','2','3')
+            GROUP BY employee_id;
+        END
+    """)
+
+
+def backfill_shift_stats(cursor):
+    """Rebuild EmployeeShiftStats from the rows already in ShiftAssignments."""
+    cursor.execute("DELETE FROM EmployeeShiftStats")
+    cursor.execute("""
+        INSERT INTO EmployeeShiftStats (employee_id, total_123, last_week, last_shift)
+        SELECT employee_id, COUNT(*), MAX(week),
+               (SELECT s.shift_code FROM ShiftAssignments s
+                WHERE s.employee_id = a.employee_id AND s.shift_code IN ('1','2','3')
+                ORDER BY s.week DESC LIMIT 1)
+        FROM ShiftAssignments a
+        WHERE shift_code IN ('1','2','3')
+        GROUP BY employee_id
+    """)
+
+
+def create_assignment_indexes(cursor):
+    """
+    Composite indexes for the per-employee gap/count/last-shift lookups and
+    the per-week roster scans. The trailing columns make both covering.
+    """
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_shift_assignments_employee_week
+        ON ShiftAssignments (employee_id, week, shift_code)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_shift_assignments_week_shift
+        ON ShiftAssignments (week, shift_code, employee_id)
+    """)
+    cursor.execute("ANALYZE ShiftAssignments")
+
+
+def migrate_shift_stats(cursor):
+    create_shift_stats(cursor)
+    backfill_shift_stats(cursor)
+
+
+# Schema migrations, applied in order. PRAGMA user_version records the last one run.
+MIGRATIONS = [
+    (1, create_assignments_table),
+    (2, create_assignment_indexes),
+    (3, migrate_shift_stats),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(cursor):
+    cursor.execute("PRAGMA user_version")
+    return cursor.fetchone()[0]
+
+
+def migrate(conn, target=SCHEMA_VERSION):
+    """Apply every migration newer than the database's user_version, up to target."""
+    cursor = conn.cursor()
+    version = get_schema_version(cursor)
+    for step_version, step in MIGRATIONS:
+        if version < step_version <= target:
+            step(cursor)
+            cursor.execute(f"PRAGMA user_version = {step_version}")
+            version = step_version
+    conn.commit()
+    return version
+
+
+def reset_assignments(conn):
+    """
+    Bring the schema up to date, then drop ShiftAssignments and recreate it
+    empty. Dropping the table also drops its indexes and triggers, so they
+    are recreated directly; user_version is left alone, so each migration
+    still runs once per database.
+    """
+    migrate(conn)
+    cursor = conn.cursor()
+    cursor.execute("DROP TABLE IF EXISTS ShiftAssignments")
+    create_assignments_table(cursor)
+    create_assignment_indexes(cursor)
+    create_shift_stats(cursor)
+    cursor.execute("DELETE FROM EmployeeShiftStats")
+    conn.commit()
+
+
+def configure_connection(conn, wal=False):
+    """Switch the planning connection to WAL journaling with synchronous=NORMAL."""
+    if wal:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+
+
+def flush_assignments(conn, rows):
+    """
+    Write buffered (employee_id, shift_code, week) rows with executemany in a
+    single transaction. Returns the seconds spent writing.
+    """
+    start = time.perf_counter()
+    with conn:
+        conn.executemany(
+            "INSERT INTO ShiftAssignments (employee_id, shift_code, week) VALUES (?, ?, ?)",
+            rows
+        )
+    return time.perf_counter() - start
+
+
+def report_write_rate(rows, seconds):
+    rate = rows / seconds if seconds else float('inf')
+    print(f"Wrote {rows} assignments in {seconds:.3f}s ({rate:,.0f} rows/s)")
+
+
+def get_shift_stats(cursor, eid):
+    """
+    Return (total_123, last_week, last_shift) for one employee. The planners
+    keep these in memory; this is the lookup for other tools that read the
+    database between runs.
+    """
+    cursor.execute("""
+        SELECT total_123, last_week, last_shift FROM EmployeeShiftStats
+        WHERE employee_id = ?
+    """, (eid,))
+    row = cursor.fetchone()
+    return row if row else (0, None, None)
+
+
+# Bring an existing database up to date (includes the EmployeeShiftStats backfill)
+if __name__ == "__main__":
+    db_path = sys.argv[1] if len(sys.argv) > 1 else 'SEL_Employess_Data.db'
+    conn = sqlite3.connect(db_path)
+    before = get_schema_version(conn.cursor())
+    after = migrate(conn)
+    print(f"'{db_path}' migrated from schema version {before} to {after}")
+    conn.close()
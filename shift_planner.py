@@ -1,41 +1,64 @@
 import sqlite3
-import random
 import csv
-from itertools import groupby
+import heapq
+from collections import defaultdict
+from shift_db import reset_assignments, configure_connection, flush_assignments, report_write_rate
+from feasibility import load_headcounts, analyse_shift_rules, report_feasibility
+from fairness import LoadQueue, CachedStream
 
 class ShiftPlanner:
-    def __init__(self, db_path='SEL_Employess_Data.db', weeks=21):
+    def __init__(self, db_path='SEL_Employess_Data.db', weeks=21, wal=False, by_class=False):
         self.db_path = db_path
         self.weeks = weeks
+        # Scan one member per equivalence class instead of everyone (see candidates)
+        self.by_class = by_class
         self.conn = sqlite3.connect(self.db_path)
+        configure_connection(self.conn, wal=wal)
         self.cursor = self.conn.cursor()
+        # The current week's assignments, flushed in one transaction when the week is done
+        self.pending = []
+        # (Band, Domain) -> LoadQueue, and each member's (total_123, last_week, last_shift)
+        self.queues = defaultdict(LoadQueue)
+        self.stats = {}
+        self.profile = {}
+
+    def load_queues(self):
+        """
+        Read the roster and EmployeeShiftStats once and file every Associate
+        and Layam in the least-loaded-first queue of their band and domain.
+        The picks below read these instead of the database. The queues hold
+        members inside the 5-week gap too, since the fallbacks may relax it.
+        """
+        self.cursor.execute("SELECT id, Name, Band, Experience, Domain, Sub_Domain FROM Employees")
+        self.profile = {row[0]: row for row in self.cursor.fetchall()}
+        self.cursor.execute("SELECT employee_id, total_123, last_week, last_shift FROM EmployeeShiftStats")
+        self.stats = {eid: (count, last_week, last_shift) for eid, count, last_week, last_shift in self.cursor.fetchall()}
+        self.queues = defaultdict(LoadQueue)
+        for eid, (_, _, band, _, domain, _) in self.profile.items():
+            if band in ('Associate', 'Layam'):
+                self.queues[(band, domain)].push(eid, self.stats.get(eid, (0, None, None))[0])
+
+    def record_week(self, rows):
+        # Same totals as the EmployeeShiftStats triggers, applied once the week is flushed
+        for eid, shift_code, week in rows:
+            if shift_code not in ('1', '2', '3'):
+                continue
+            count = self.stats.get(eid, (0, None, None))[0] + 1
+            self.stats[eid] = (count, week, shift_code)
+            _, _, band, _, domain, _ = self.profile[eid]
+            self.queues[(band, domain)].push(eid, count)
 
     def assigned_shift_1_2_3_recently(self, eid, current_week, gap=5):
         if current_week <= gap:
             return False
-        self.cursor.execute("""
-            SELECT week FROM ShiftAssignments
-            WHERE employee_id = ? 
-              AND shift_code IN ('1','2','3') 
-              AND week > ?
-        """, (eid, current_week - gap))
-        return self.cursor.fetchone() is not None
-
-    def get_shift_1_2_3_count(self, eid):
-        self.cursor.execute("""
-            SELECT COUNT(*) FROM ShiftAssignments 
-            WHERE employee_id = ? AND shift_code IN ('1', '2', '3')
-        """, (eid,))
-        return self.cursor.fetchone()[0]
+        _, last_week, _ = self.stats.get(eid, (0, None, None))
+        return last_week is not None and last_week > current_week - gap
 
     def get_last_shift_1_2_3(self, eid):
-        self.cursor.execute("""
-            SELECT shift_code FROM ShiftAssignments
-            WHERE employee_id = ? AND shift_code IN ('1', '2', '3')
-            ORDER BY week DESC LIMIT 1
-        """, (eid,))
-        row = self.cursor.fetchone()
-        return row[0] if row else None
+        return self.stats.get(eid, (0, None, None))[2]
+
+    def assign_shift(self, eid, shift_code, week):
+        self.pending.append((eid, shift_code, week))
 
     def get_employee_experience(self, eid):
         self.cursor.execute("SELECT Experience FROM Employees WHERE id = ?", (eid,))
@@ -57,28 +80,49 @@ class ShiftPlanner:
         self.cursor.execute(sql)
         return self.cursor.fetchall()
 
-    def group_shuffle(self, lst):
-        result = []
-        for _, group in groupby(lst, key=lambda x: self.get_shift_1_2_3_count(x[0])):
-            group_list = list(group)
-            random.shuffle(group_list)
-            result.extend(group_list)
-        return result
+    def candidates(self, week, shift_code, assigned_ids, bands, domain=None):
+        """
+        Rows of the bands' queues (only domain's, if given) not placed yet
+        this week, fewest shifts first and at random within a total, merged
+        lazily from the queues. The rows read are kept, so the fallback
+        passes scan the same order again without a re-sort.
+
+        With by_class, each equivalence class (same Band, Domain, Sub_Domain,
+        Experience) keeps its first member outside the gap and not on
+        shift_code last time, and its first member who is not. Classmates are
+        interchangeable for every rule, so the scans below lose no option.
+        """
+        excluded = set(assigned_ids)
+        merged = heapq.merge(*(
+            queue.walk() for (band, queue_domain), queue in self.queues.items()
+            if band in bands and domain in (None, queue_domain)
+        ))
+
+        def rows():
+            seen = set()
+            for _, _, _, eid in merged:
+                if eid in excluded:
+                    continue
+                row = self.profile[eid]
+                if self.by_class:
+                    held = self.assigned_shift_1_2_3_recently(eid, week) or self.get_last_shift_1_2_3(eid) == shift_code
+                    cls = (row[2], row[4], row[5], row[3], held)
+                    if cls in seen:
+                        continue
+                    seen.add(cls)
+                yield row
 
-    def run(self):
-        self.cursor.execute("DROP TABLE IF EXISTS ShiftAssignments")
+        return CachedStream(rows())
 
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS ShiftAssignments (
-                assignment_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                employee_id INTEGER,
-                shift_code TEXT,
-                week INTEGER,
-                FOREIGN KEY (employee_id) REFERENCES Employees(id)
-            )
-        """)
+    def run(self):
+        # The fallbacks below relax the gap, so shortfalls are only reported
+        report_feasibility(analyse_shift_rules(load_headcounts(self.cursor), self.weeks), self.weeks)
 
-        self.cursor.execute("DELETE FROM ShiftAssignments")
+        reset_assignments(self.conn)
+        self.load_queues()
+        self.pending = []
+        written = 0
+        write_seconds = 0.0
 
         # Track last domain and subdomain per shift globally across weeks
         last_domain_shift1 = None
@@ -94,18 +138,12 @@ class ShiftPlanner:
             self.cursor.execute("SELECT id FROM Employees WHERE Experience = 0")
             shift_g_exp0 = [row[0] for row in self.cursor.fetchall()]
             for eid in shift_g_exp0:
-                self.cursor.execute(
-                    "INSERT INTO ShiftAssignments (employee_id, shift_code, week) VALUES (?, ?, ?)",
-                    (eid, 'G', week)
-                )
+                self.assign_shift(eid, 'G', week)
                 assigned_ids.add(eid)
 
             # SHIFT 1 — Associate
             shift1_needed = 1
-            eligible_1 = self.get_next(assigned_ids, "Band='Associate'")
-            eligible_1 = list(eligible_1)
-            eligible_1.sort(key=lambda row: self.get_shift_1_2_3_count(row[0]))
-            eligible_1 = self.group_shuffle(eligible_1)
+            eligible_1 = self.candidates(week, '1', assigned_ids, ('Associate',))
 
             for eid, _, _, exp, domain, sub_domain in eligible_1:
                 if shift1_needed == 0:
@@ -119,10 +157,7 @@ class ShiftPlanner:
                 last_shift = self.get_last_shift_1_2_3(eid)
                 if last_shift == '1':
                     continue
-                self.cursor.execute(
-                    "INSERT INTO ShiftAssignments (employee_id, shift_code, week) VALUES (?, ?, ?)",
-                    (eid, '1', week)
-                )
+                self.assign_shift(eid, '1', week)
                 assigned_ids.add(eid)
                 shift1_needed -= 1
                 last_domain_shift1 = domain
@@ -138,10 +173,7 @@ class ShiftPlanner:
                     last_shift = self.get_last_shift_1_2_3(eid)
                     if last_shift == '1':
                         continue
-                    self.cursor.execute(
-                        "INSERT INTO ShiftAssignments (employee_id, shift_code, week) VALUES (?, ?, ?)",
-                        (eid, '1', week)
-                    )
+                    self.assign_shift(eid, '1', week)
                     assigned_ids.add(eid)
                     shift1_needed -= 1
                     last_domain_shift1 = domain
@@ -151,13 +183,8 @@ class ShiftPlanner:
             # SHIFT 2 — Layam: 1 AD-SEL + 1 FD-SEL with FD-SEL subdomain alternation
             shift2_assigned = {'AD-SEL': 0, 'FD-SEL': 0}
             
-            eligible_2 = self.get_next(assigned_ids, "Band='Layam'")
-            eligible_2 = list(eligible_2)
-            eligible_2.sort(key=lambda x: self.get_shift_1_2_3_count(x[0]))
-
-            # Separate by domain
-            eligible_fd_sel = [e for e in eligible_2 if e[4] == 'FD-SEL']
-            eligible_ad_sel = [e for e in eligible_2 if e[4] == 'AD-SEL']
+            eligible_fd_sel = self.candidates(week, '2', assigned_ids, ('Layam',), 'FD-SEL')
+            eligible_ad_sel = self.candidates(week, '2', assigned_ids, ('Layam',), 'AD-SEL')
 
             # First assign FD-SEL with strict subdomain alternation
             fd_sel_assigned = False
@@ -172,10 +199,7 @@ class ShiftPlanner:
                 last_shift = self.get_last_shift_1_2_3(eid)
                 if last_shift == '2':
                     continue
-                self.cursor.execute(
-                    "INSERT INTO ShiftAssignments (employee_id, shift_code, week) VALUES (?, ?, ?)",
-                    (eid, '2', week)
-                )
+                self.assign_shift(eid, '2', week)
                 assigned_ids.add(eid)
                 shift2_assigned['FD-SEL'] += 1
                 last_subdomain_shift2 = sub_domain
@@ -193,10 +217,7 @@ class ShiftPlanner:
                     last_shift = self.get_last_shift_1_2_3(eid)
                     if last_shift == '2':
                         continue
-                    self.cursor.execute(
-                        "INSERT INTO ShiftAssignments (employee_id, shift_code, week) VALUES (?, ?, ?)",
-                        (eid, '2', week)
-                    )
+                    self.assign_shift(eid, '2', week)
                     assigned_ids.add(eid)
                     shift2_assigned['FD-SEL'] += 1
                     last_subdomain_shift2 = sub_domain
@@ -211,10 +232,7 @@ class ShiftPlanner:
                     # Still enforce subdomain alternation
                     if last_subdomain_shift2 is not None and sub_domain == last_subdomain_shift2:
                         continue
-                    self.cursor.execute(
-                        "INSERT INTO ShiftAssignments (employee_id, shift_code, week) VALUES (?, ?, ?)",
-                        (eid, '2', week)
-                    )
+                    self.assign_shift(eid, '2', week)
                     assigned_ids.add(eid)
                     shift2_assigned['FD-SEL'] += 1
                     last_subdomain_shift2 = sub_domain
@@ -226,10 +244,7 @@ class ShiftPlanner:
                 for eid, _, _, exp, domain, sub_domain in eligible_fd_sel:
                     if eid in assigned_ids:
                         continue
-                    self.cursor.execute(
-                        "INSERT INTO ShiftAssignments (employee_id, shift_code, week) VALUES (?, ?, ?)",
-                        (eid, '2', week)
-                    )
+                    self.assign_shift(eid, '2', week)
                     assigned_ids.add(eid)
                     shift2_assigned['FD-SEL'] += 1
                     last_subdomain_shift2 = sub_domain
@@ -246,10 +261,7 @@ class ShiftPlanner:
                 last_shift = self.get_last_shift_1_2_3(eid)
                 if last_shift == '2':
                     continue
-                self.cursor.execute(
-                    "INSERT INTO ShiftAssignments (employee_id, shift_code, week) VALUES (?, ?, ?)",
-                    (eid, '2', week)
-                )
+                self.assign_shift(eid, '2', week)
                 assigned_ids.add(eid)
                 shift2_assigned['AD-SEL'] += 1
                 ad_sel_assigned = True
@@ -263,10 +275,7 @@ class ShiftPlanner:
                     last_shift = self.get_last_shift_1_2_3(eid)
                     if last_shift == '2':
                         continue
-                    self.cursor.execute(
-                        "INSERT INTO ShiftAssignments (employee_id, shift_code, week) VALUES (?, ?, ?)",
-                        (eid, '2', week)
-                    )
+                    self.assign_shift(eid, '2', week)
                     assigned_ids.add(eid)
                     shift2_assigned['AD-SEL'] += 1
                     ad_sel_assigned = True
@@ -277,10 +286,7 @@ class ShiftPlanner:
                 for eid, _, _, exp, domain, sub_domain in eligible_ad_sel:
                     if eid in assigned_ids:
                         continue
-                    self.cursor.execute(
-                        "INSERT INTO ShiftAssignments (employee_id, shift_code, week) VALUES (?, ?, ?)",
-                        (eid, '2', week)
-                    )
+                    self.assign_shift(eid, '2', week)
                     assigned_ids.add(eid)
                     shift2_assigned['AD-SEL'] += 1
                     ad_sel_assigned = True
@@ -288,10 +294,7 @@ class ShiftPlanner:
 
             # SHIFT 3 — 1 Associate + 1 Layam
             shift3_needed = {'Associate': 1, 'Layam': 1}
-            eligible_3 = self.get_next(assigned_ids, "Band IN ('Associate', 'Layam')")
-            eligible_3 = list(eligible_3)
-            eligible_3.sort(key=lambda row: self.get_shift_1_2_3_count(row[0]))
-            eligible_3 = self.group_shuffle(eligible_3)
+            eligible_3 = self.candidates(week, '3', assigned_ids, ('Associate', 'Layam'))
 
             for eid, _, band, exp, domain, sub_domain in eligible_3:
                 if shift3_needed[band] == 0:
@@ -305,10 +308,7 @@ class ShiftPlanner:
                 last_shift = self.get_last_shift_1_2_3(eid)
                 if last_shift == '3':
                     continue
-                self.cursor.execute(
-                    "INSERT INTO ShiftAssignments (employee_id, shift_code, week) VALUES (?, ?, ?)",
-                    (eid, '3', week)
-                )
+                self.assign_shift(eid, '3', week)
                 assigned_ids.add(eid)
                 shift3_needed[band] -= 1
                 last_domain_shift3[band] = domain
@@ -332,10 +332,7 @@ class ShiftPlanner:
                     last_shift = self.get_last_shift_1_2_3(eid)
                     if last_shift == '3':
                         continue
-                    self.cursor.execute(
-                        "INSERT INTO ShiftAssignments (employee_id, shift_code, week) VALUES (?, ?, ?)",
-                        (eid, '3', week)
-                    )
+                    self.assign_shift(eid, '3', week)
                     assigned_ids.add(eid)
                     shift3_needed[band] -= 1
                     last_domain_shift3[band] = domain
@@ -353,10 +350,7 @@ class ShiftPlanner:
                         continue
                     if shift3_needed.get(band, 0) == 0:
                         continue
-                    self.cursor.execute(
-                        "INSERT INTO ShiftAssignments (employee_id, shift_code, week) VALUES (?, ?, ?)",
-                        (eid, '3', week)
-                    )
+                    self.assign_shift(eid, '3', week)
                     assigned_ids.add(eid)
                     shift3_needed[band] -= 1
                     last_domain_shift3[band] = domain
@@ -370,13 +364,16 @@ class ShiftPlanner:
             # Remaining → Shift G
             remaining = self.get_next(assigned_ids, "1=1")
             for eid, *_ in remaining:
-                self.cursor.execute(
-                    "INSERT INTO ShiftAssignments (employee_id, shift_code, week) VALUES (?, ?, ?)",
-                    (eid, 'G', week)
-                )
+                self.assign_shift(eid, 'G', week)
                 assigned_ids.add(eid)
 
-        self.conn.commit()
+            write_seconds += flush_assignments(self.conn, self.pending)
+            written += len(self.pending)
+            # Later weeks see this week's shifts through the queues
+            self.record_week(self.pending)
+            self.pending = []
+
+        report_write_rate(written, write_seconds)
 
         # Output results
         print("\nFinal Shift Planner Result (Pivoted 21 Weeks):\n")
@@ -415,6 +412,7 @@ class ShiftPlanner:
 
         print("\nFinal result saved to 'shift_planner_result.csv'\n")
 
+        self.cursor.execute("PRAGMA optimize")
         self.conn.close()
 
 
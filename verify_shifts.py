@@ -1,180 +1,593 @@
+import argparse
 import csv
-from collections import defaultdict
+import json
+import re
+import sqlite3
+from bisect import insort
+from collections import Counter, namedtuple
+from itertools import groupby
+from operator import itemgetter
+
+from fairness import FairnessScoreboard
 
 filename = "shift_planner_result.csv"
+SHIFTS_123 = {'1', '2', '3'}
+# shift.py / shift_planner.py write "Shift Week N", planner.py writes "Week N"
+WEEK_COLUMN = re.compile(r"^(?:Shift )?Week (\d+)$")
+# Conditions in report order
+CONDITIONS = (1, 3, 4, 5, 6, 7, 10, 11, 13)
+# Rules the planners are allowed to relax (with a WARNING); every other rule is hard
+ALTERNATION_RULES = {
+    "shift1_domain_alternation", "shift1_subdomain_alternation",
+    "shift2_subdomain_alternation",
+    "shift3_domain_alternation", "shift3_subdomain_alternation",
+}
 
-# Load data
-employees = []
-with open(filename, newline='', encoding='utf-8') as f:
-    reader = csv.DictReader(f)
-    weeks = [f"Shift Week {i}" for i in range(1, 22)]
-    for row in reader:
-        employees.append(row)
+# One failed check. week is the week label (None for per-employee or
+# per-experience rules), employee the Name (None for per-week rules).
+Violation = namedtuple("Violation", "condition rule week employee message")
 
-# Helper: get shifts per week per employee
-def get_shifts(emp):
-    return [emp[w] for w in weeks]
 
-# Condition 1: Experience 0 → only G
-def check_exp0_shift_g():
-    failed = []
-    for emp in employees:
-        if int(emp['Exp']) == 0:
-            shifts = get_shifts(emp)
-            if any(s != 'G' for s in shifts):
-                failed.append(emp['Name'])
-    return failed
+def detect_week_columns(fieldnames):
+    """Week columns of a CSV header, ordered by week number, whatever the horizon."""
+    found = [(int(m.group(1)), name) for name in fieldnames if (m := WEEK_COLUMN.match(name))]
+    return [name for _, name in sorted(found)]
+
 
-# Condition 2: One shift per week (always true in CSV)
+def week_number(column):
+    return int(WEEK_COLUMN.match(column).group(1))
+
+
+# Per-week rules. staff maps '1'/'2'/'3' to (Name, Band, Domain, Sub_Domain, Exp)
+# tuples in roster order. The alternation rules take the state left by the
+# previous week and return (violations, state for the next week).
 
 # Condition 3: Shift counts per week
-def check_shift_counts():
-    for w in weeks:
-        count_1 = sum(emp[w] == '1' for emp in employees)
-        count_2 = sum(emp[w] == '2' for emp in employees)
-        count_3 = sum(emp[w] == '3' for emp in employees)
-        if count_1 != 1 or count_2 != 2 or count_3 != 2:
-            print(f"Week {w}: Shift counts - 1:{count_1}, 2:{count_2}, 3:{count_3}")
-
-# Condition 4: Shift 1 alternation
-def check_shift1_alternation():
-    last_domain = None
-    last_subdomain = None
-    for i, w in enumerate(weeks):
-        shift1_emp = [emp for emp in employees if emp[w] == '1']
-        if len(shift1_emp) != 1:
-            print(f"Week {w}: Shift 1 count != 1")
-            continue
-        emp = shift1_emp[0]
-        if emp['Band'] != 'Associate':
-            print(f"Week {w}: Shift 1 employee {emp['Name']} band not Associate")
-        domain = emp['Domain']
-        subdomain = emp['Sub_Domain']
+def week_shift_counts(w, staff):
+    count_1, count_2, count_3 = (len(staff[code]) for code in ('1', '2', '3'))
+    if count_1 != 1 or count_2 != 2 or count_3 != 2:
+        return [Violation(3, "shift_counts", w, None,
+                          f"Week {w}: Shift counts - 1:{count_1}, 2:{count_2}, 3:{count_3}")]
+    return []
+
+
+# Condition 4: Shift 1 alternation; state is (last domain, last subdomain)
+SHIFT1_START = (None, None)
+
+
+def week_shift1(w, staff, state):
+    if len(staff['1']) != 1:
+        return [Violation(4, "shift1_count", w, None, f"Week {w}: Shift 1 count != 1")], state
+    last_domain, last_subdomain = state
+    name, band, domain, subdomain, _ = staff['1'][0]
+    found = []
+    if band != 'Associate':
+        found.append(Violation(4, "shift1_band", w, name, f"Week {w}: Shift 1 employee {name} band not Associate"))
+    if last_domain == domain:
+        found.append(Violation(4, "shift1_domain_alternation", w, name,
+                               f"Week {w}: Shift 1 domain not alternating (same as last week)"))
+    if domain == 'FD-SEL' and last_subdomain == subdomain:
+        found.append(Violation(4, "shift1_subdomain_alternation", w, name,
+                               f"Week {w}: Shift 1 FD-SEL subdomain not alternating"))
+    return found, (domain, subdomain)
+
+
+# Condition 5: Shift 2 alternation and band/domain; state is the last FD-SEL subdomain
+SHIFT2_START = None
+
+
+def week_shift2(w, staff, state):
+    shift2_emps = staff['2']
+    if len(shift2_emps) != 2:
+        return [Violation(5, "shift2_count", w, None, f"Week {w}: Shift 2 count != 2")], state
+    found = []
+    if {emp[1] for emp in shift2_emps} != {'Layam'}:
+        found.append(Violation(5, "shift2_band", w, None, f"Week {w}: Shift 2 employees not all Layam"))
+    domains = [emp[2] for emp in shift2_emps]
+    if 'AD-SEL' not in domains or 'FD-SEL' not in domains:
+        found.append(Violation(5, "shift2_domains", w, None, f"Week {w}: Shift 2 domains not AD-SEL and FD-SEL"))
+    fd_emp = next((emp for emp in shift2_emps if emp[2] == 'FD-SEL'), None)
+    if fd_emp is None:
+        return found, state
+    if state == fd_emp[3]:
+        found.append(Violation(5, "shift2_subdomain_alternation", w, fd_emp[0],
+                               f"Week {w}: Shift 2 FD-SEL subdomain not alternating"))
+    return found, fd_emp[3]
+
+
+# Condition 6: Shift 3 alternation and band/domain; state is
+# ((band, last domain, last subdomain), ...) sorted by band
+SHIFT3_START = (('Associate', None, None), ('Layam', None, None))
+
+
+def week_shift3(w, staff, state):
+    shift3_emps = staff['3']
+    if len(shift3_emps) != 2:
+        return [Violation(6, "shift3_count", w, None, f"Week {w}: Shift 3 count != 2")], state
+    found = []
+    if {emp[1] for emp in shift3_emps} != {'Associate', 'Layam'}:
+        found.append(Violation(6, "shift3_bands", w, None,
+                               f"Week {w}: Shift 3 employees not one Associate and one Layam"))
+    last = {band: (domain, subdomain) for band, domain, subdomain in state}
+    for name, band, domain, subdomain, _ in shift3_emps:
+        last_domain, last_subdomain = last.get(band, (None, None))
         if last_domain == domain:
-            print(f"Week {w}: Shift 1 domain not alternating (same as last week)")
+            found.append(Violation(6, "shift3_domain_alternation", w, name,
+                                   f"Week {w}: Shift 3 {band} domain not alternating"))
         if domain == 'FD-SEL' and last_subdomain == subdomain:
-            print(f"Week {w}: Shift 1 FD-SEL subdomain not alternating")
-        last_domain = domain
-        last_subdomain = subdomain
-
-# Condition 5: Shift 2 alternation and band/domain
-def check_shift2_conditions():
-    last_fd_subdomain = None
-    for w in weeks:
-        shift2_emps = [emp for emp in employees if emp[w] == '2']
-        if len(shift2_emps) != 2:
-            print(f"Week {w}: Shift 2 count != 2")
-            continue
-        bands = set(emp['Band'] for emp in shift2_emps)
-        if bands != {'Layam'}:
-            print(f"Week {w}: Shift 2 employees not all Layam")
-        domains = [emp['Domain'] for emp in shift2_emps]
-        if 'AD-SEL' not in domains or 'FD-SEL' not in domains:
-            print(f"Week {w}: Shift 2 domains not AD-SEL and FD-SEL")
-        fd_emp = next(emp for emp in shift2_emps if emp['Domain'] == 'FD-SEL')
-        fd_subdomain = fd_emp['Sub_Domain']
-        if last_fd_subdomain == fd_subdomain:
-            print(f"Week {w}: Shift 2 FD-SEL subdomain not alternating")
-        last_fd_subdomain = fd_subdomain
-
-# Condition 6: Shift 3 alternation and band/domain
-def check_shift3_conditions():
-    last_domains = {'Associate': None, 'Layam': None}
-    last_subdomains = {'Associate': None, 'Layam': None}
-    for w in weeks:
-        shift3_emps = [emp for emp in employees if emp[w] == '3']
-        if len(shift3_emps) != 2:
-            print(f"Week {w}: Shift 3 count != 2")
-            continue
-        bands = set(emp['Band'] for emp in shift3_emps)
-        if bands != {'Associate', 'Layam'}:
-            print(f"Week {w}: Shift 3 employees not one Associate and one Layam")
-        for emp in shift3_emps:
-            band = emp['Band']
-            domain = emp['Domain']
-            subdomain = emp['Sub_Domain']
-            if last_domains[band] == domain:
-                print(f"Week {w}: Shift 3 {band} domain not alternating")
-            if domain == 'FD-SEL' and last_subdomains[band] == subdomain:
-                print(f"Week {w}: Shift 3 {band} FD-SEL subdomain not alternating")
-            last_domains[band] = domain
-            last_subdomains[band] = subdomain
-
-# Condition 7: Only FD-SEL has subdomain
-def check_fd_sel_subdomain():
-    for emp in employees:
-        for w in weeks:
-            shift = emp[w]
-            if shift in {'1','2','3'}:
-                domain = emp['Domain']
-                subdomain = emp['Sub_Domain']
-                if domain != 'FD-SEL' and subdomain:
-                    print(f"{emp['Name']} week {w}: Non FD-SEL with subdomain {subdomain}")
-
-# Condition 9: Rest assigned G (implied by shift counts)
-
-# Condition 10: Minimum 5 week gap for shifts 1/2/3
-def check_min_gap():
-    for emp in employees:
-        weeks_assigned = [i for i,w in enumerate(weeks,1) if emp[w] in {'1','2','3'}]
-        for i in range(1, len(weeks_assigned)):
-            gap = weeks_assigned[i] - weeks_assigned[i-1]
-            if gap < 5:
-                print(f"{emp['Name']} assigned shifts too close: weeks {weeks_assigned[i-1]} and {weeks_assigned[i]}")
+            found.append(Violation(6, "shift3_subdomain_alternation", w, name,
+                                   f"Week {w}: Shift 3 {band} FD-SEL subdomain not alternating"))
+        last[band] = (domain, subdomain)
+    return found, tuple(sorted((band, *last[band]) for band in last))
+
 
 # Condition 11: Experience difference ≤ 2 for pairs in shifts 2 and 3
-def check_exp_diff_pairs():
-    for w in weeks:
-        for shift_code in ['2','3']:
-            emps = [emp for emp in employees if emp[w] == shift_code]
-            if len(emps) == 2:
-                exp_diff = abs(int(emps[0]['Exp']) - int(emps[1]['Exp']))
-                if exp_diff > 2:
-                    print(f"Week {w} shift {shift_code} experience diff > 2: {exp_diff}")
+def week_exp_diff_pairs(w, staff):
+    found = []
+    for shift_code in ['2', '3']:
+        emps = staff[shift_code]
+        if len(emps) == 2:
+            exp_diff = abs(emps[0][4] - emps[1][4])
+            if exp_diff > 2:
+                found.append(Violation(11, "exp_diff_pair", w, None,
+                                       f"Week {w} shift {shift_code} experience diff > 2: {exp_diff}"))
+    return found
+
+
+# Condition 1: Experience 0 → only G
+def exp0_check(name, exp, assigned, non_g, num_weeks):
+    """assigned: weeks with any code; non_g: weeks with a code other than G."""
+    if exp == 0 and (assigned != num_weeks or non_g):
+        return [Violation(1, "exp0_not_g", None, name, name)]
+    return []
+
+
+def planned_sub_domain(domain, sub_domain):
+    """Sub_Domain as shift.py writes it to the CSV: blank outside FD-SEL (req 7)."""
+    return (sub_domain or '') if domain == 'FD-SEL' else ''
+
+
+def employee_checks(name, domain, sub_domain, shifts, weeks, week_numbers):
+    """
+    Conditions 7 and 10 for one employee. shifts are (week index, code)
+    pairs in week order.
+    """
+    found = []
+    # Condition 10 keeps only the last shift week: a sliding window of one
+    # entry per employee, so long horizons stay linear in time and constant in memory
+    last_week = None
+    for i, shift in shifts:
+        if shift not in SHIFTS_123:
+            continue
+        # Condition 7: Only FD-SEL has subdomain
+        if domain != 'FD-SEL' and sub_domain:
+            found.append(Violation(7, "non_fd_subdomain", weeks[i], name,
+                                   f"{name} week {weeks[i]}: Non FD-SEL with subdomain {sub_domain}"))
+        # Condition 10: Minimum 5 week gap for shifts 1/2/3
+        week = week_numbers[i]
+        if last_week is not None and week - last_week < 5:
+            found.append(Violation(10, "min_gap", weeks[i], name,
+                                   f"{name} assigned shifts too close: weeks {last_week} and {week}"))
+        last_week = week
+    return found
+
 
 # Condition 13: Same experience → similar total shifts 1/2/3
-def check_balanced_shifts():
-    exp_groups = defaultdict(list)
-    for emp in employees:
-        exp = int(emp['Exp'])
-        total_shifts = sum(1 for w in weeks if emp[w] in {'1','2','3'})
-        exp_groups[exp].append(total_shifts)
-    for exp, counts in exp_groups.items():
-        avg = sum(counts)/len(counts)
-        max_diff = max(abs(c - avg) for c in counts)
-        if max_diff > 3:  # threshold, can adjust
-            print(f"Exp {exp} shifts imbalance: max diff {max_diff}")
-
-# Run all checks
-print("Checking condition 1...")
-failed_exp0 = check_exp0_shift_g()
-if failed_exp0:
-    print("Employees with Exp 0 not always G:", failed_exp0)
-else:
-    print("Condition 1 passed.")
-
-print("\nChecking condition 3...")
-check_shift_counts()
-
-print("\nChecking condition 4...")
-check_shift1_alternation()
-
-print("\nChecking condition 5...")
-check_shift2_conditions()
-
-print("\nChecking condition 6...")
-check_shift3_conditions()
-
-print("\nChecking condition 7...")
-check_fd_sel_subdomain()
-
-print("\nChecking condition 10...")
-check_min_gap()
-
-print("\nChecking condition 11...")
-check_exp_diff_pairs()
-
-print("\nChecking condition 13...")
-check_balanced_shifts()
-
-print("\nAll other conditions (2,8,9) are structural or implied and assumed met.")
+def exp_balance(exp, n, total, lowest, highest):
+    avg = total / n
+    max_diff = max(abs(lowest - avg), abs(highest - avg))
+    if max_diff > 3:  # threshold, can adjust
+        return [Violation(13, "exp_imbalance", None, None, f"Exp {exp} shifts imbalance: max diff {max_diff}")]
+    return []
+
+
+class StreamingValidator:
+    """
+    Checks every condition in one pass over the employees. Each one updates
+    per-week accumulators (who is on shift 1/2/3) and per-employee results
+    (exp 0, subdomain, 5-week gap, totals per experience), so memory grows
+    with the people on shift, not with the whole roster. finish() runs the
+    week-major checks and returns the Violation records.
+    """
+
+    def __init__(self, weeks, exp_column='Exp'):
+        self.weeks = weeks
+        self.week_numbers = [week_number(w) for w in weeks]
+        self.exp_column = exp_column
+        self.violations = []
+        # week index -> shift code -> (Name, Band, Domain, Sub_Domain, Exp) in row order
+        self.week_staff = [{'1': [], '2': [], '3': []} for _ in weeks]
+        # Shift totals per experience level (condition 13), one member per row
+        self.exp_board = FairnessScoreboard()
+
+    def add(self, emp):
+        """One CSV row (a dict keyed by the header)."""
+        exp = int(float(emp[self.exp_column] or 0))
+        self.add_employee(
+            emp['Name'], emp['Band'], emp['Domain'], emp['Sub_Domain'], exp,
+            [(i, emp[w]) for i, w in enumerate(self.weeks)]
+        )
+
+    def add_employee(self, name, band, domain, sub_domain, exp, shifts):
+        """
+        One employee's plan as (week index, shift code) pairs in week order.
+        Weeks without a pair count as unassigned.
+        """
+        non_g = sum(1 for _, s in shifts if s != 'G')
+        self.violations += exp0_check(name, exp, len(shifts), non_g, len(self.weeks))
+        self.violations += employee_checks(name, domain, sub_domain, shifts, self.weeks, self.week_numbers)
+        staff = (name, band, domain, sub_domain, exp)
+        total = 0
+        for i, shift in shifts:
+            if shift in SHIFTS_123:
+                self.week_staff[i][shift].append(staff)
+                total += 1
+
+        self.exp_board.add_member(len(self.exp_board.counts), exp, count=total)
+
+    # Conditions 3, 4, 5, 6 and 11 walk the weeks in order; the per-week
+    # rules live in the week_* functions so ValidatorState can re-run one week
+    def check_shift_counts(self):
+        for w, staff in zip(self.weeks, self.week_staff):
+            self.violations += week_shift_counts(w, staff)
+
+    def check_shift1_alternation(self):
+        state = SHIFT1_START
+        for w, staff in zip(self.weeks, self.week_staff):
+            found, state = week_shift1(w, staff, state)
+            self.violations += found
+
+    def check_shift2_conditions(self):
+        state = SHIFT2_START
+        for w, staff in zip(self.weeks, self.week_staff):
+            found, state = week_shift2(w, staff, state)
+            self.violations += found
+
+    def check_shift3_conditions(self):
+        state = SHIFT3_START
+        for w, staff in zip(self.weeks, self.week_staff):
+            found, state = week_shift3(w, staff, state)
+            self.violations += found
+
+    def check_exp_diff_pairs(self):
+        for w, staff in zip(self.weeks, self.week_staff):
+            self.violations += week_exp_diff_pairs(w, staff)
+
+    def check_balanced_shifts(self):
+        board = self.exp_board
+        for exp in board.groups():
+            self.violations += exp_balance(exp, board.size(exp), board.total(exp),
+                                           board.lowest(exp), board.highest(exp))
+
+    def finish(self):
+        """Run the week-major and per-experience checks; violations in report order."""
+        self.check_shift_counts()
+        self.check_shift1_alternation()
+        self.check_shift2_conditions()
+        self.check_shift3_conditions()
+        self.check_exp_diff_pairs()
+        self.check_balanced_shifts()
+        order = {condition: k for k, condition in enumerate(CONDITIONS)}
+        # stable sort keeps row / week order inside each condition
+        return sorted(self.violations, key=lambda v: order[v.condition])
+
+
+# Violations that appeared / disappeared with one ValidatorState.apply()
+Delta = namedtuple("Delta", "added removed")
+
+# Alternation chains: condition -> (per-week rule, state before week 1)
+CHAINS = {
+    4: (week_shift1, SHIFT1_START),
+    5: (week_shift2, SHIFT2_START),
+    6: (week_shift3, SHIFT3_START),
+}
+
+
+class ValidatorState:
+    """
+    A plan with its validator accumulators kept live, for local edits.
+    apply() changes one cell and re-checks only what it touches: that
+    week's counts and pairs, each alternation chain from that week until
+    its state matches the old one again, the employee's own shift weeks
+    (gap and subdomain), and that experience group's totals.
+    """
+
+    def __init__(self, weeks, employees):
+        """
+        weeks: week labels ("Shift Week N" / "Week N")
+        employees: (id, Name, Band, Experience, Domain, Sub_Domain) rows in roster order
+        """
+        self.weeks = weeks
+        self.week_numbers = [week_number(w) for w in weeks]
+        self.week_index = {week: i for i, week in enumerate(self.week_numbers)}
+        self.order = {}
+        self.profile = {}
+        for pos, (eid, name, band, exp, domain, sub_domain) in enumerate(employees):
+            self.order[eid] = pos
+            self.profile[eid] = (name, band, domain or '', planned_sub_domain(domain, sub_domain), int(exp or 0))
+
+        self.cells = {eid: {} for eid in self.profile}        # eid -> week index -> code
+        self.shift_weeks = {eid: [] for eid in self.profile}  # sorted week indexes on 1/2/3
+        self.non_g = dict.fromkeys(self.profile, 0)
+        # week index -> code -> sorted (roster position, eid) on that shift
+        self.week_members = [{'1': [], '2': [], '3': []} for _ in weeks]
+        # Shift totals per experience level (condition 13)
+        self.exp_board = FairnessScoreboard()
+        for eid, (_, _, _, _, exp) in self.profile.items():
+            self.exp_board.add_member(eid, exp)
+
+        self.week_found = [{} for _ in weeks]  # week index -> condition -> violations
+        self.chain_in = {c: [start] * len(weeks) for c, (_, start) in CHAINS.items()}
+        self.employee_found = {}
+        self.exp_found = {}
+
+    @classmethod
+    def from_assignments(cls, assignments, employees, num_weeks=None):
+        """Same inputs as validate_assignments."""
+        assignments = list(assignments)
+        horizon = num_weeks or max((week for _, _, week in assignments), default=0)
+        state = cls([f"Shift Week {w}" for w in range(1, horizon + 1)], employees)
+        for eid, code, week in assignments:
+            state.set_cell(eid, week - 1, code)
+        state.recheck_all()
+        return state
+
+    def set_cell(self, eid, i, code):
+        """Update the accumulators for one cell, without re-checking."""
+        cells = self.cells[eid]
+        old = cells.get(i, '')
+        if old == code:
+            return old
+        total = len(self.shift_weeks[eid])
+        if old in SHIFTS_123:
+            self.week_members[i][old].remove((self.order[eid], eid))
+            self.shift_weeks[eid].remove(i)
+        if code in SHIFTS_123:
+            insort(self.week_members[i][code], (self.order[eid], eid))
+            insort(self.shift_weeks[eid], i)
+        self.non_g[eid] += (code not in ('', 'G')) - (old not in ('', 'G'))
+        if code:
+            cells[i] = code
+        else:
+            cells.pop(i, None)
+        new_total = len(self.shift_weeks[eid])
+        if new_total != total:
+            self.exp_board.record(eid, new_total - total)
+        return old
+
+    def staff(self, i):
+        return {code: [self.profile[eid] for _, eid in members]
+                for code, members in self.week_members[i].items()}
+
+    # The check_* methods re-check one scope and return its (old, new) violations
+
+    def check_week(self, i):
+        """Conditions 3 and 11 for week i."""
+        staff = self.staff(i)
+        w = self.weeks[i]
+        old = self.week_found[i].get(3, []) + self.week_found[i].get(11, [])
+        self.week_found[i][3] = week_shift_counts(w, staff)
+        self.week_found[i][11] = week_exp_diff_pairs(w, staff)
+        return old, self.week_found[i][3] + self.week_found[i][11]
+
+    def check_chain(self, condition, i):
+        """
+        Re-run one alternation chain from week i, stopping at the first week
+        whose incoming state is unchanged.
+        """
+        step, _ = CHAINS[condition]
+        old, new = [], []
+        while i < len(self.weeks):
+            old += self.week_found[i].get(condition, [])
+            found, state = step(self.weeks[i], self.staff(i), self.chain_in[condition][i])
+            self.week_found[i][condition] = found
+            new += found
+            i += 1
+            if i == len(self.weeks) or self.chain_in[condition][i] == state:
+                break
+            self.chain_in[condition][i] = state
+        return old, new
+
+    def check_employee(self, eid):
+        name, _, domain, sub_domain, exp = self.profile[eid]
+        old = self.employee_found.get(eid, [])
+        shifts = [(i, self.cells[eid][i]) for i in self.shift_weeks[eid]]
+        self.employee_found[eid] = (
+            exp0_check(name, exp, len(self.cells[eid]), self.non_g[eid], len(self.weeks))
+            + employee_checks(name, domain, sub_domain, shifts, self.weeks, self.week_numbers)
+        )
+        return old, self.employee_found[eid]
+
+    def check_exp(self, exp):
+        board = self.exp_board
+        old = self.exp_found.get(exp, [])
+        n = board.size(exp)
+        self.exp_found[exp] = exp_balance(exp, n, board.total(exp), board.lowest(exp), board.highest(exp)) if n else []
+        return old, self.exp_found[exp]
+
+    def recheck_all(self):
+        for i in range(len(self.weeks)):
+            self.check_week(i)
+        for condition in CHAINS:
+            self.check_chain_full(condition)
+        for eid in self.profile:
+            self.check_employee(eid)
+        self.exp_found = {}
+        for _, (_, _, _, _, exp) in sorted(self.profile.items(), key=lambda item: self.order[item[0]]):
+            if exp not in self.exp_found:
+                self.check_exp(exp)
+
+    def check_chain_full(self, condition):
+        step, state = CHAINS[condition]
+        for i, w in enumerate(self.weeks):
+            self.chain_in[condition][i] = state
+            self.week_found[i][condition], state = step(w, self.staff(i), state)
+
+    def apply(self, eid, week, code):
+        """
+        Set employee eid's code ('1', '2', '3', 'G' or '' for unassigned) in
+        week number `week` and return the Delta of violations.
+        """
+        i = self.week_index[week]
+        if self.cells[eid].get(i, '') == code:
+            return Delta([], [])
+        self.set_cell(eid, i, code)
+
+        old, new = [], []
+        scopes = [self.check_week(i), self.check_employee(eid), self.check_exp(self.profile[eid][4])]
+        scopes += [self.check_chain(condition, i) for condition in CHAINS]
+        for scope_old, scope_new in scopes:
+            old += scope_old
+            new += scope_new
+
+        old_count, new_count = Counter(old), Counter(new)
+        return Delta(list((new_count - old_count).elements()), list((old_count - new_count).elements()))
+
+    def violations(self):
+        """Every current violation, in the same order as validate_assignments."""
+        by_condition = {condition: [] for condition in CONDITIONS}
+        for eid in sorted(self.employee_found, key=self.order.get):
+            for v in self.employee_found[eid]:
+                by_condition[v.condition].append(v)
+        for found in self.week_found:
+            for condition in (3, 4, 5, 6, 11):
+                by_condition[condition] += found.get(condition, [])
+        for found in self.exp_found.values():
+            by_condition[13] += found
+        return [v for condition in CONDITIONS for v in by_condition[condition]]
+
+
+def count_violations(violations):
+    return Counter(v.rule for v in violations)
+
+
+def print_report(violations):
+    """The classic per-condition text report."""
+    by_condition = {condition: [] for condition in CONDITIONS}
+    for v in violations:
+        by_condition[v.condition].append(v)
+
+    print("Checking condition 1...")
+    if by_condition[1]:
+        print("Employees with Exp 0 not always G:", [v.employee for v in by_condition[1]])
+    else:
+        print("Condition 1 passed.")
+    for condition in CONDITIONS[1:]:
+        print(f"\nChecking condition {condition}...")
+        for v in by_condition[condition]:
+            print(v.message)
+    print("\nAll other conditions (2,8,9) are structural or implied and assumed met.")
+
+
+def print_summary(violations, title="Post-check"):
+    """One line for an in-process check after planning."""
+    counts = count_violations(violations)
+    if not counts:
+        print(f"{title}: all checks passed")
+        return
+    detail = ", ".join(f"{rule}: {n}" for rule, n in counts.most_common())
+    print(f"{title}: {len(violations)} violations ({detail})")
+
+
+def to_json(violations):
+    return json.dumps({
+        "total": len(violations),
+        "counts": dict(count_violations(violations)),
+        "violations": [v._asdict() for v in violations],
+    }, indent=2)
+
+
+def validate_csv(path=filename):
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        header = reader.fieldnames or []
+        exp_column = 'Exp' if 'Exp' in header else 'Experience'
+        validator = StreamingValidator(detect_week_columns(header), exp_column)
+        for row in reader:
+            validator.add(row)
+    return validator.finish()
+
+
+def validate_assignments(assignments, employees, num_weeks=None):
+    """
+    Check an in-memory plan without writing it anywhere.
+
+    assignments: (employee_id, shift_code, week) rows, weeks from 1
+    employees: (id, Name, Band, Experience, Domain, Sub_Domain) rows
+    Weeks and sub-domains are as in shift.py's CSV ("Shift Week N").
+    """
+    plans = {}
+    horizon = 0
+    for eid, code, week in assignments:
+        plans.setdefault(eid, []).append((week - 1, code))
+        horizon = max(horizon, week)
+    if num_weeks is not None:
+        horizon = num_weeks
+    validator = StreamingValidator([f"Shift Week {w}" for w in range(1, horizon + 1)])
+    for eid, name, band, exp, domain, sub_domain in employees:
+        shifts = sorted(plans.get(eid, []))
+        validator.add_employee(name, band, domain or '', planned_sub_domain(domain, sub_domain), int(exp or 0), shifts)
+    return validator.finish()
+
+
+def validate_grid(grid, employees, labels=None, week_prefix="Week"):
+    """
+    Check a schedule grid: one row of shift codes per employee, one column
+    per week. labels maps integer cells to codes (planner.py's SHIFT_LABELS).
+
+    employees: (Name, Band, Experience, Domain, Sub_Domain) rows in grid order
+    """
+    num_weeks = len(grid[0]) if len(grid) else 0
+    validator = StreamingValidator([f"{week_prefix} {w}" for w in range(1, num_weeks + 1)])
+    for row, (name, band, exp, domain, sub_domain) in zip(grid, employees):
+        codes = [labels[c] for c in row.tolist()] if labels is not None else list(row)
+        validator.add_employee(
+            name, band, domain or '', sub_domain or '', int(exp or 0),
+            [(i, code) for i, code in enumerate(codes) if code]
+        )
+    return validator.finish()
+
+
+def validate_db(db_path):
+    """
+    Check the plan straight from ShiftAssignments: one scan ordered by
+    (employee_id, week), which idx_shift_assignments_employee_week covers,
+    with no pivot or CSV in between. Weeks and sub-domains are as in
+    shift.py's CSV, so both give the same report.
+    """
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute("SELECT MAX(week) FROM ShiftAssignments")
+    horizon = cursor.fetchone()[0] or 0
+    validator = StreamingValidator([f"Shift Week {w}" for w in range(1, horizon + 1)])
+    cursor.execute("""
+        SELECT e.id, e.Name, e.Band, e.Experience, e.Domain, e.Sub_Domain, a.week, a.shift_code
+        FROM Employees e
+        LEFT JOIN ShiftAssignments a ON a.employee_id = e.id
+        ORDER BY e.id, a.week
+    """)
+    for _, rows in groupby(cursor, key=itemgetter(0)):
+        rows = list(rows)
+        _, name, band, exp, domain, sub_domain, _, _ = rows[0]
+        shifts = [(week - 1, code) for *_, week, code in rows if week is not None]
+        validator.add_employee(name, band, domain or '', planned_sub_domain(domain, sub_domain), int(exp or 0), shifts)
+    conn.close()
+    return validator.finish()
+
+
+def is_sqlite(path):
+    with open(path, 'rb') as f:
+        return f.read(16) == b"SQLite format 3\x00"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check a shift plan (CSV or planner database) against the rules")
+    parser.add_argument("path", nargs="?", default=filename)
+    parser.add_argument("--json", action="store_true", help="print violation records and counts as JSON")
+    args = parser.parse_args()
+
+    violations = validate_db(args.path) if is_sqlite(args.path) else validate_csv(args.path)
+    if args.json:
+        print(to_json(violations))
+    else:
+        print_report(violations)
@@ -0,0 +1,150 @@
+import argparse
+import sqlite3
+from bisect import bisect_left
+from collections import Counter
+
+from verify_shifts import CONDITIONS, SHIFTS_123, Delta, ValidatorState, week_number
+
+
+class WhatIf:
+    """
+    Swap / replace / drop questions against a ValidatorState. Each query
+    applies its edits, reads the violation Delta, and reverts them, so it
+    costs a few apply() calls: the week, its alternation neighbours and the
+    people's own gap windows. Nothing changes unless commit() is called.
+    """
+
+    def __init__(self, state, gap=5):
+        self.state = state
+        self.gap = gap
+
+    def code(self, eid, week):
+        return self.state.cells[eid].get(self.state.week_index[week], '')
+
+    def apply_edits(self, edits):
+        """Apply (eid, week, code) edits in order; returns the net Delta and the edits that undo them."""
+        net = Counter()
+        undo = []
+        for eid, week, code in edits:
+            undo.append((eid, week, self.code(eid, week)))
+            delta = self.state.apply(eid, week, code)
+            net.update(delta.added)
+            net.subtract(delta.removed)
+        return Delta(list((+net).elements()), list((-net).elements())), undo[::-1]
+
+    def trial(self, edits):
+        """Net Delta of applying the edits, which are undone again."""
+        delta, undo = self.apply_edits(edits)
+        self.apply_edits(undo)
+        return delta
+
+    def commit(self, edits):
+        return [self.state.apply(eid, week, code) for eid, week, code in edits]
+
+    # Edits behind each question
+
+    def swap_edits(self, a, b, week):
+        return [(a, week, self.code(b, week)), (b, week, self.code(a, week))]
+
+    def replace_edits(self, out_eid, in_eid, week):
+        """in_eid takes out_eid's shift, out_eid goes to G (in_eid's old slot, if any, is left open)."""
+        return [(out_eid, week, 'G'), (in_eid, week, self.code(out_eid, week))]
+
+    def drop_edits(self, eid, week):
+        return [(eid, week, 'G')]
+
+    def swap(self, a, b, week):
+        return self.trial(self.swap_edits(a, b, week))
+
+    def replace(self, out_eid, in_eid, week):
+        return self.trial(self.replace_edits(out_eid, in_eid, week))
+
+    def drop(self, eid, week):
+        return self.trial(self.drop_edits(eid, week))
+
+    def clear_of_gap(self, eid, week):
+        """No shift 1/2/3 within gap-1 weeks of week, from the sorted shift weeks (O(log n))."""
+        weeks = self.state.shift_weeks[eid]
+        i = self.state.week_index[week]
+        k = bisect_left(weeks, i - self.gap + 1)
+        return k == len(weeks) or weeks[k] > i + self.gap - 1
+
+    def candidates(self, eid, week):
+        """
+        Everyone who could take eid's shift in week without adding a
+        violation. People already on a shift that week or inside their gap
+        window are skipped before the trial.
+        """
+        if self.code(eid, week) not in SHIFTS_123:
+            return []
+        found = []
+        for other in self.state.profile:
+            if other == eid or self.code(other, week) in SHIFTS_123:
+                continue
+            if not self.clear_of_gap(other, week):
+                continue
+            if not self.replace(eid, other, week).added:
+                found.append(other)
+        return found
+
+
+def load_state(db_path):
+    """ValidatorState of the plan stored in a planner database."""
+    conn = sqlite3.connect(db_path)
+    employees = conn.execute("""
+        SELECT id, Name, Band, Experience, Domain, Sub_Domain FROM Employees ORDER BY id
+    """).fetchall()
+    assignments = conn.execute("SELECT employee_id, shift_code, week FROM ShiftAssignments").fetchall()
+    conn.close()
+    return ValidatorState.from_assignments(assignments, employees)
+
+
+def report_order(v):
+    return CONDITIONS.index(v.condition), week_number(v.week) if v.week else 0
+
+
+def print_delta(question, delta):
+    verdict = "OK" if not delta.added else "NOT OK"
+    print(f"{question}: {verdict} ({len(delta.added)} new violations, {len(delta.removed)} resolved)")
+    for v in sorted(delta.added, key=report_order):
+        print(f"  + {v.message}")
+    for v in sorted(delta.removed, key=report_order):
+        print(f"  - {v.message}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="What-if questions against a planned schedule")
+    parser.add_argument("db")
+    parser.add_argument("query", choices=["swap", "replace", "drop", "candidates"])
+    parser.add_argument("names", nargs="+", help="one or two employee names")
+    parser.add_argument("--week", type=int, required=True)
+    args = parser.parse_args()
+    needed = 2 if args.query in ("swap", "replace") else 1
+    if len(args.names) != needed:
+        parser.error(f"{args.query} takes {needed} employee name{'s' if needed > 1 else ''}, got {len(args.names)}")
+
+    state = load_state(args.db)
+    by_name = {profile[0]: eid for eid, profile in state.profile.items()}
+    unknown = [name for name in args.names if name not in by_name]
+    if unknown:
+        parser.error(f"unknown employee: {', '.join(unknown)}")
+    if args.week not in state.week_index:
+        planned = f"weeks {min(state.week_numbers)}-{max(state.week_numbers)}" if state.week_numbers else "no weeks"
+        parser.error(f"week {args.week} is not in the plan ({planned})")
+    eids = [by_name[name] for name in args.names]
+    what_if = WhatIf(state)
+
+    if args.query == "swap":
+        print_delta(f"Swap {args.names[0]} and {args.names[1]} in week {args.week}",
+                    what_if.swap(eids[0], eids[1], args.week))
+    elif args.query == "replace":
+        print_delta(f"Replace {args.names[0]} with {args.names[1]} in week {args.week}",
+                    what_if.replace(eids[0], eids[1], args.week))
+    elif args.query == "drop":
+        print_delta(f"Drop {args.names[0]} from week {args.week}", what_if.drop(eids[0], args.week))
+    else:
+        legal = what_if.candidates(eids[0], args.week)
+        print(f"{len(legal)} legal replacements for {args.names[0]} "
+              f"(Shift {what_if.code(eids[0], args.week)}) in week {args.week}:")
+        for eid in legal:
+            print(f"  {state.profile[eid][0]}")